@@ -23,6 +23,18 @@ import { STUB_MSDC_LEADS } from "./stub-data";
  * Response: MsdcLeadsResponse containing filtered and paginated leads data
  */
 
+const LEAD_COLUMNS =
+  "lead_id, customer_name, pic, segment, channel, need_description, tender_name, project_value_m, status_tender, created_at";
+
+/** Same normalization as the leads_search_text_trg trigger (0003_leads_search.sql). */
+function normalizeSearchText(value: string | undefined): string {
+  return (value ?? "").replace(/\s+/g, " ").trim().toLowerCase();
+}
+
+function escapeLikePattern(value: string): string {
+  return value.replace(/[\\%_]/g, (ch) => `\\${ch}`);
+}
+
 function applyStatusFilter(leads: MsdcLead[], status: string | undefined): MsdcLead[] {
   if (!status) return leads;
   return leads.filter((lead) => lead.status_tender === status);
@@ -97,7 +109,7 @@ async function fetchLeadsFromSupabase(tenantId: string, params: MsdcLeadsQueryPa
   const { status, q, page = 1, pageSize = 20, lembaga, year } = params;
   const supabase = await createServerClient();
 
-  let query = supabase.from("leads").select("*", { count: "exact" }).eq("tenant_id", tenantId);
+  let query = supabase.from("leads").select(LEAD_COLUMNS, { count: "exact" }).eq("tenant_id", tenantId);
 
   if (status) {
     query = query.eq("status_tender", status);
@@ -108,12 +120,13 @@ async function fetchLeadsFromSupabase(tenantId: string, params: MsdcLeadsQueryPa
   }
 
   if (year) {
-    query = query.gte("created_at", `${year}-01-01`).lte("created_at", `${year}-12-31`);
+    query = query.gte("created_at", `${year}-01-01`).lt("created_at", `${year + 1}-01-01`);
   }
 
-  if (q) {
-    const like = `%${q}%`;
-    query = query.or(`customer_name.ilike.${like},tender_name.ilike.${like},pic.ilike.${like}`);
+  const search = normalizeSearchText(q);
+  if (search) {
+    // search_text is maintained by a trigger and backed by a trigram index.
+    query = query.ilike("search_text", `%${escapeLikePattern(search)}%`);
   }
 
   const startIndex = (page - 1) * pageSize;
@@ -49,6 +49,8 @@ export type LeadsRow = {
   project_value_m: number | null;
   status_tender: string | null;
   created_at: string | null;
+  search_text: string | null;
+  import_id: string | null;
 };
 
 export type MembershipsRow = {
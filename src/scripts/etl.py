@@ -1,10 +1,29 @@
+"""LOP cleaning pipeline: Excel → cleaned CSV/XLSX/Parquet.
+
+Stages (each takes and returns a DataFrame, so they compose and can run on
+an in-memory frame, e.g. from `etl_worker`):
+
+  read_excel → canonicalize → clean → dedupe → validate → export
+
+`run_pipeline(config)` runs them all; `python etl.py --help` shows the CLI.
+pandas / numpy / openpyxl are imported lazily inside the stages, so importing
+this module, `--help` and `--check` stay fast.
+"""
+
+from __future__ import annotations
+
+import argparse
+import numbers
 import os
 import re
 import sys
-import numpy as np
-import pandas as pd
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # ========== Konfigurasi path & parameter ==========
 def _get_base_dir() -> Path:
@@ -15,27 +34,88 @@ def _get_base_dir() -> Path:
 
 BASE_DIR = _get_base_dir()
 
-EXCEL_PATH = os.getenv("EXCEL_PATH", str(BASE_DIR / "Template LOP 2026 Upd_SF 041125.xlsx"))
-OUTPUT_DIR = os.getenv("OUTPUT_DIR", str(BASE_DIR / "output"))
-SHEET_NAME = os.getenv("SHEET_NAME", "").strip() or None
-
-HEADER_ROW_ONE_BASED = int(os.getenv("HEADER_ROW_ONE_BASED", "3"))
-HEADER_INDEX = max(HEADER_ROW_ONE_BASED - 1, 0)
-EST_WIN_YEAR = int(os.getenv("EST_WIN_YEAR", "2026"))
+DEFAULT_EXCEL_PATH = str(BASE_DIR / "Template LOP 2026 Upd_SF 041125.xlsx")
+DEFAULT_OUTPUT_DIR = str(BASE_DIR / "output")
 
 # prioritas sumber untuk dedupe
 SOURCE_PRIORITY = ["BIDDING", "MSDC", "SALES", "MARKETING", "OTHER"]
 
+ALLOWED_STAGES = {"leads", "prospect", "qualified", "submission", "win", None}
+REQUIRED_COLUMNS = ["company_name", "project_name", "funnel_stage", "source_division", "created_at"]
+
+
+@dataclass
+class EtlConfig:
+    """Pipeline parameters; `from_env()` reads the same env vars as before."""
+
+    excel_path: str = DEFAULT_EXCEL_PATH
+    output_dir: str = DEFAULT_OUTPUT_DIR
+    sheet_name: Optional[str] = None
+    header_row_one_based: int = 3
+    est_win_year: int = 2026
+
+    @property
+    def header_index(self) -> int:
+        return max(self.header_row_one_based - 1, 0)
+
+    @classmethod
+    def from_env(cls) -> "EtlConfig":
+        return cls(
+            excel_path=os.getenv("EXCEL_PATH", DEFAULT_EXCEL_PATH),
+            output_dir=os.getenv("OUTPUT_DIR", DEFAULT_OUTPUT_DIR),
+            sheet_name=os.getenv("SHEET_NAME", "").strip() or None,
+            header_row_one_based=int(os.getenv("HEADER_ROW_ONE_BASED", "3")),
+            est_win_year=int(os.getenv("EST_WIN_YEAR", "2026")),
+        )
+
+    def validate(self) -> List[str]:
+        """Return config problems (empty list = OK). Does not touch pandas."""
+        problems = []
+        if not Path(self.excel_path).is_file():
+            problems.append(f"EXCEL_PATH not found: {self.excel_path}")
+        if self.header_row_one_based < 1:
+            problems.append(f"HEADER_ROW_ONE_BASED must be >= 1, got {self.header_row_one_based}")
+        if not 2000 <= self.est_win_year <= 2100:
+            problems.append(f"EST_WIN_YEAR looks wrong: {self.est_win_year}")
+        out = Path(self.output_dir)
+        if out.exists() and not out.is_dir():
+            problems.append(f"OUTPUT_DIR is not a directory: {self.output_dir}")
+        return problems
+
+
+@dataclass
+class PipelineResult:
+    df: "pd.DataFrame"
+    rows_read: int
+    rows_after_drop_key: int
+    issues: Dict[str, int]
+    written: List[str] = field(default_factory=list)
+    failed: List[Tuple[str, Exception]] = field(default_factory=list)
+
 # ========== Helper: normalisasi ==========
+# The per-cell helpers below run through `.apply` on every cell, so they must
+# not pay for an `import pandas` statement per call; pandas' isna is bound once.
+_pd_isna = None
+
+def _isna(x) -> bool:
+    global _pd_isna
+    if x is None:
+        return True
+    if isinstance(x, str):
+        return False
+    if _pd_isna is None:
+        from pandas import isna as _pd_isna
+    return bool(_pd_isna(x))
+
 def normalize_text(x: str) -> str:
-    if pd.isna(x):
+    if _isna(x):
         return None
     x = str(x).strip()
     x = re.sub(r"\s+", " ", x)
     return x if x else None
 
 def normalize_company(name: str) -> str:
-    if not name or pd.isna(name):
+    if not name or _isna(name):
         return None
     x = str(name).upper().strip()
     x = x.replace("P.T.", "PT").replace("PT.", "PT").replace(" C V ", " CV ")
@@ -44,41 +124,96 @@ def normalize_company(name: str) -> str:
     x = re.sub(r"\bT\s*B\s*K\b\.?", "TBK", x)
     x = re.sub(r"[.,;:/\\]+", " ", x)
     x = re.sub(r"\s+", " ", x).strip()
-    return x 
+    return x
 
 def parse_money(val):
-    if pd.isna(val):
-        return np.nan
+    if _isna(val):
+        return float("nan")
+    if isinstance(val, numbers.Real) and not isinstance(val, bool):
+        # Numeric cells (read_excel keeps money columns numeric) are final.
+        return float(val)
     s = str(val).strip()
     if not s:
-        return np.nan
+        return float("nan")
     sign = "-" if s.startswith("-") else ""
     s = s.lstrip("+-")
     s = re.sub(r"[^0-9.,]", "", s)
     if not s:
-        return np.nan
-    last_dot = s.rfind(".")
-    last_comma = s.rfind(",")
-    dec_pos = max(last_dot, last_comma)
-    if dec_pos == -1:
-        cleaned = re.sub(r"[.,]", "", s)
+        return float("nan")
+    has_dot, has_comma = "." in s, "," in s
+    if has_dot and has_comma:
+        # "1.250.000,5" / "2,000,000.5": the later separator is the decimal one
+        dec = "," if s.rfind(",") > s.rfind(".") else "."
+        group = "." if dec == "," else ","
+        cleaned = s.replace(group, "").replace(dec, ".")
+    elif has_dot or has_comma:
+        sep = "." if has_dot else ","
+        if re.fullmatch(rf"\d{{1,3}}(\{sep}\d{{3}})+", s):
+            # "1.250.000" / "2,000,000" / "1.250": thousands grouping
+            cleaned = s.replace(sep, "")
+        elif s.count(sep) == 1:
+            cleaned = s.replace(sep, ".")
+        else:
+            return float("nan")
     else:
-        int_part = re.sub(r"[.,]", "", s[:dec_pos])
-        frac_part = re.sub(r"[.,]", "", s[dec_pos + 1 :])
-        cleaned = f"{int_part}.{frac_part}"
+        cleaned = s
     try:
         return float(f"{sign}{cleaned}")
     except Exception:
-        return np.nan
+        return float("nan")
+
+# Digits grouped by "." or "," in threes, optionally followed by decimals:
+# "1.250.000", "2,000,000.5", "1.250.000,5".
+MONEY_GROUPING_PATTERN = r"\d{1,3}([.,]\d{3})+([.,]\d+)?"
+
+def parse_money_series(values: pd.Series) -> pd.Series:
+    """Vectorized `parse_money` for a text column (same separator rules)."""
+    import numpy as np
+    import pandas as pd
+
+    text = values.astype("string").str.strip()
+    sign = text.str.startswith("-").fillna(False)
+    body = text.str.replace(r"[^0-9.,]", "", regex=True)
+    body = body.mask(body == "")
+
+    has_dot = body.str.contains(".", regex=False).fillna(False)
+    has_comma = body.str.contains(",", regex=False).fillna(False)
+    both = has_dot & has_comma
+    comma_decimal = body.str.rfind(",") > body.str.rfind(".")
+    sep_count = body.str.count(r"[.,]").fillna(0)
+    grouped = (has_dot ^ has_comma) & body.str.fullmatch(r"\d{1,3}([.,]\d{3})+").fillna(False)
+
+    cleaned = pd.Series(pd.NA, index=body.index, dtype="string")
+    conditions = [
+        ~has_dot & ~has_comma,
+        both & comma_decimal,
+        both & ~comma_decimal,
+        grouped,
+        (has_dot ^ has_comma) & (sep_count == 1),
+    ]
+    choices = [
+        body,
+        body.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+        body.str.replace(",", "", regex=False),
+        body.str.replace(r"[.,]", "", regex=True),
+        body.str.replace(",", ".", regex=False),
+    ]
+    for condition, choice in zip(reversed(conditions), reversed(choices)):
+        cleaned = cleaned.mask(condition, choice)
+
+    parsed = pd.to_numeric(cleaned, errors="coerce").astype("float64")
+    return pd.Series(np.where(sign, -parsed, parsed), index=values.index, dtype="float64")
 
 def parse_datetime(val):
-    # Kept for backward compatibility; prefer vectorized branch below.
+    # Kept for backward compatibility; prefer date_parsing.parse_datetime_column.
+    import pandas as pd
+
     if pd.isna(val):
         return pd.NaT
     return pd.to_datetime(val, errors="coerce", dayfirst=True)
 
 def normalize_stage(stage):
-    if pd.isna(stage): return None
+    if _isna(stage): return None
     x = str(stage).strip().lower()
     mapping = {
         "lead": "leads", "leads": "leads",
@@ -90,7 +225,7 @@ def normalize_stage(stage):
     return mapping.get(x, x)
 
 def normalize_source(src):
-    if pd.isna(src): return "OTHER"
+    if _isna(src): return "OTHER"
     x = str(src).strip().upper()
     if "BIDD" in x: return "BIDDING"
     if "MSDC" in x: return "MSDC"
@@ -142,46 +277,13 @@ def drop_unnamed_and_empty(df: pd.DataFrame) -> pd.DataFrame:
     df = df.dropna(axis=0, how="all")
     return df
 
-# ========== 1) Read Excel (header di baris ke-3 default) ==========
-print(f"Reading: {EXCEL_PATH}")
-read_kwargs = dict(sheet_name=SHEET_NAME or 0, dtype=str, header=HEADER_INDEX)
-df = pd.read_excel(EXCEL_PATH, **read_kwargs)
-
-df = drop_unnamed_and_empty(df)
-if isinstance(df.columns, pd.MultiIndex):
-    df.columns = [c[-1] if isinstance(c, tuple) else c for c in df.columns]
-df = canonicalize_columns(df)
-
-# Pastikan kolom kunci minimal ada
-for required in ["company_name", "project_name", "funnel_stage", "source_division", "created_at"]:
-    if required not in df.columns:
-        df[required] = np.nan
-
-# Trim semua kolom teks
-for c in df.columns:
-    df[c] = df[c].apply(normalize_text)
-
-# Default sumber & fallback tanggal
-if "source_division" not in df.columns or df["source_division"].isna().all():
-    df["source_division"] = "SALES"
-
-# Jika ada beberapa kandidat uang, pilih satu → est_revenue
-money_candidates = [
-    c for c in ["Nilai 2026", "est_revenue", "nilai project", "est win (mm)", "est live (mm)"]
-    if c in df.columns
-]
-
-if money_candidates:
-    df["est_revenue"] = df[money_candidates[0]]
-
-# ========== 2) Cleaning kolom spesifik ==========
-df["company_name"]    = df["company_name"].apply(normalize_company)
-df["project_name"]    = df["project_name"].str.upper().str.strip()
-df["funnel_stage"]    = df["funnel_stage"].apply(normalize_stage)
-df["source_division"] = df["source_division"].apply(normalize_source)
-
-if "est_revenue" in df.columns:
-    df["est_revenue"] = df["est_revenue"].apply(parse_money).astype("float64")
+# Money columns are read as-is: numeric cells stay numbers (a float cell
+# 2.375 must not become the string "2.375", which parse_money would read as
+# thousands grouping). Only text cells go through parse_money's heuristics.
+MONEY_COLUMNS = {a.lower() for a in COLUMN_ALIASES["est_revenue"]} | {"est_revenue"}
+
+def _is_money_column(name) -> bool:
+    return str(name).strip().lower() in MONEY_COLUMNS
 
 # ---- Est Win (mmm) → est_win_month & expected_close_date ----
 MONTH_MAP = {
@@ -190,168 +292,301 @@ MONTH_MAP = {
     "SEP": 9, "OCT": 10, "NOV": 11, "DEC": 12,
 }
 
-est_col_candidates = [c for c in df.columns if str(c).strip().lower() == "est win (mmm)".lower()]
+# ========== 1) Read Excel (header di baris ke-3 default) ==========
+def read_excel(config: EtlConfig) -> pd.DataFrame:
+    import pandas as pd
+
+    read_kwargs = dict(sheet_name=config.sheet_name or 0, dtype=object, header=config.header_index)
+    df = pd.read_excel(config.excel_path, **read_kwargs)
+    # Same as dtype=str for every column except the money ones
+    for c in df.columns:
+        if not _is_money_column(c):
+            df[c] = df[c].map(lambda v: v if _isna(v) else str(v))
+    return df
+
+# ========== 2) Alias → canonical ==========
+def canonicalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop empty/unnamed columns, flatten headers, map aliases to canonical names."""
+    import pandas as pd
 
-if est_col_candidates:
-    est_col = est_col_candidates[0]
+    df = drop_unnamed_and_empty(df)
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = [c[-1] if isinstance(c, tuple) else c for c in df.columns]
+    return canonicalize_columns(df)
 
-    # Normalisasi teks ke 3 huruf uppercase
-    raw_est = df[est_col].astype(str).str.strip()
-    abbrev = raw_est.str[:3].str.upper()
+# ========== 3) Cleaning kolom spesifik ==========
+def clean(df: pd.DataFrame, est_win_year: int = 2026, template: Optional[str] = None) -> pd.DataFrame:
+    """Normalize text/money/stage/source/dates and drop rows without a key."""
+    import numpy as np
+    import pandas as pd
 
-    # Simpan bulan (1–12) ke kolom baru est_win_month
-    df["est_win_month"] = abbrev.map(MONTH_MAP).astype("Int64")
+    from date_parsing import build_month_start_dates, parse_datetime_column, template_key
 
-    # Optional: bikin tanggal estimasi (pakai tanggal 1 tiap bulan)
-    df["expected_close_date"] = pd.to_datetime(
-        EST_WIN_YEAR.astype(str) + "-" + df["est_win_month"].astype(str) + "-01",
-        errors="coerce",
-    )
-else:
-    # Kalau belum ada kolom Est Win (mmm), tetap definisikan kolom kosong
-    df["est_win_month"] = pd.Series(pd.array([pd.NA] * len(df), dtype="Int64"))
-    df["expected_close_date"] = pd.NaT
-
-for dt_col in ["created_at", "updated_at"]:
-    if dt_col in df.columns:
-        raw = df[dt_col]
-        parsed = pd.to_datetime(raw, errors="coerce", dayfirst=True)
-        serial_mask = parsed.isna()
-        if serial_mask.any():
-            serials = pd.to_numeric(raw, errors="coerce")
-            serial_mask &= serials.notna()
-            parsed.loc[serial_mask] = pd.to_datetime(
-                serials.loc[serial_mask],
-                unit="d",
-                origin="1899-12-30",
-                errors="coerce",
-            )
-        df[dt_col] = parsed
-
-# Buang baris tanpa key
-before_rows = len(df)
-df = df[~(df["company_name"].isna() | df["project_name"].isna())].copy()
-after_drop_key = len(df)
-
-# ========== 3) Dedupe (company_name, project_name) + timestamp fallback ==========
-df["_src_rank"] = df["source_division"].apply(source_rank)
-upd = df["updated_at"] if "updated_at" in df.columns else pd.Series(pd.NaT, index=df.index)
-cre = df["created_at"] if "created_at" in df.columns else pd.Series(pd.NaT, index=df.index)
-df["_ts"] = upd.fillna(cre)
-
-df = df.sort_values(by=["company_name", "project_name", "_src_rank", "_ts"],
-                    ascending=[True, True, True, False])
-df = df.drop_duplicates(subset=["company_name", "project_name"], keep="first").copy()
-df = df.drop(columns=["_src_rank", "_ts"])
-
-# Audit
-df["ingested_at_utc"] = pd.Timestamp.now(tz=timezone.utc)
-
-# ========== 4) Validasi ringkas ==========
-issues = {}
-allowed_stages = {"leads", "prospect", "qualified", "submission", "win", None}
-bad_stage = df[~df["funnel_stage"].isin(allowed_stages)]
-if len(bad_stage) > 0:
-    issues["invalid_stage_rows"] = len(bad_stage)
-
-if "est_revenue" in df.columns:
-    neg_rev = df[df["est_revenue"] < 0]
-    if len(neg_rev) > 0:
-        issues["negative_revenue_rows"] = len(neg_rev)
-
-missing_created = df["created_at"].isna().sum()
-if missing_created > 0:
-    issues["missing_created_at"] = int(missing_created)
-
-print("\n=== VALIDATION SUMMARY ===")
-print(f"Rows read                : {before_rows}")
-print(f"Rows after drop key-null : {after_drop_key}")
-print(f"Rows after dedupe        : {len(df)}")
-if issues:
-    for k, v in issues.items():
-        print(f"- {k}: {v}")
-else:
-    print("- No critical issues found.")
-
-print("\n=== QUICK STATS ===")
-if "funnel_stage" in df.columns:
-    print("By funnel_stage:")
-    print(df["funnel_stage"].value_counts(dropna=False))
-if "source_division" in df.columns:
-    print("\nBy source_division:")
-    print(df["source_division"].value_counts(dropna=False))
-
-# —— Pretty print describe tanpa scientific notation, 3 desimal ——
-if "est_revenue" in df.columns:
-    print("\nRevenue (est_revenue) describe:")
-    desc = df["est_revenue"].describe()
-    def _fmt(v):
-        if pd.isna(v):
-            return "NaN"
-        # tampilkan count sebagai integer dengan ribuan
-        if isinstance(v, (int, np.integer)) or (isinstance(v, float) and v.is_integer()):
-            return f"{int(v):,}"
-        # angka lain: ribuan + 3 desimal
-        return f"{float(v):,.3f}"
-    for k, v in desc.items():
-        print(f"{k:>6}  {_fmt(v)}")
-
-# ========== 5) Export hasil ==========
-try:
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-except Exception as e:
-    print(f"Failed to create output dir {OUTPUT_DIR}: {e}")
-    sys.exit(1)
-
-# nama file: gunakan UTC lalu jadikan naive untuk string
-ts = datetime.now(timezone.utc).replace(tzinfo=None).strftime("%Y%m%d-%H%M%S")
-
-csv_path = os.path.join(OUTPUT_DIR, f"lop_clean_{ts}.csv")
-xlsx_path = os.path.join(OUTPUT_DIR, f"lop_clean_{ts}.xlsx")
-pq_path  = os.path.join(OUTPUT_DIR, f"lop_clean_{ts}.parquet")
-
-written = []
-failed = []
-
-try:
-    df.to_csv(csv_path, index=False, encoding="utf-8")
-    written.append(csv_path)
-except Exception as e:
-    failed.append((csv_path, e))
-
-# sebelum to_excel: hilangkan timezone agar Excel tidak error
-for col in df.select_dtypes(include=["datetimetz"]).columns:
+    df = df.copy()
+
+    # Pastikan kolom kunci minimal ada
+    for required in REQUIRED_COLUMNS:
+        if required not in df.columns:
+            df[required] = np.nan
+
+    # Trim semua kolom teks (kolom uang dibiarkan numerik untuk parse_money)
+    for c in df.columns:
+        if not _is_money_column(c):
+            df[c] = df[c].apply(normalize_text)
+
+    # Default sumber & fallback tanggal
+    if "source_division" not in df.columns or df["source_division"].isna().all():
+        df["source_division"] = "SALES"
+
+    # Jika ada beberapa kandidat uang, pilih satu → est_revenue
+    money_candidates = [
+        c for c in ["Nilai 2026", "est_revenue", "nilai project", "est win (mm)", "est live (mm)"]
+        if c in df.columns
+    ]
+
+    if money_candidates:
+        df["est_revenue"] = df[money_candidates[0]]
+
+    df["company_name"]    = df["company_name"].apply(normalize_company)
+    df["project_name"]    = df["project_name"].str.upper().str.strip()
+    df["funnel_stage"]    = df["funnel_stage"].apply(normalize_stage)
+    df["source_division"] = df["source_division"].apply(normalize_source)
+
+    if "est_revenue" in df.columns:
+        df["est_revenue"] = df["est_revenue"].apply(parse_money).astype("float64")
+
+    est_col_candidates = [c for c in df.columns if str(c).strip().lower() == "est win (mmm)".lower()]
+
+    if est_col_candidates:
+        est_col = est_col_candidates[0]
+
+        # Normalisasi teks ke 3 huruf uppercase
+        raw_est = df[est_col].astype(str).str.strip()
+        abbrev = raw_est.str[:3].str.upper()
+
+        # Simpan bulan (1–12) ke kolom baru est_win_month
+        df["est_win_month"] = abbrev.map(MONTH_MAP).astype("Int64")
+
+        # Optional: bikin tanggal estimasi (pakai tanggal 1 tiap bulan)
+        df["expected_close_date"] = build_month_start_dates(df["est_win_month"], est_win_year)
+    else:
+        # Kalau belum ada kolom Est Win (mmm), tetap definisikan kolom kosong
+        df["est_win_month"] = pd.Series(pd.NA, index=df.index, dtype="Int64")
+        df["expected_close_date"] = pd.NaT
+
+    # Format tanggal di-infer sekali per kolom & template, lalu parse vektor
+    date_template = template or template_key(df.columns, prefix="etl")
+    for dt_col in ["created_at", "updated_at"]:
+        if dt_col in df.columns:
+            df[dt_col] = parse_datetime_column(df[dt_col], template=date_template, column=dt_col)
+
+    # Buang baris tanpa key
+    return df[~(df["company_name"].isna() | df["project_name"].isna())].copy()
+
+# ========== 4) Dedupe (company_name, project_name) + timestamp fallback ==========
+def dedupe(df: pd.DataFrame) -> pd.DataFrame:
+    import pandas as pd
+
+    df = df.copy()
+    df["_src_rank"] = df["source_division"].apply(source_rank)
+    upd = df["updated_at"] if "updated_at" in df.columns else pd.Series(pd.NaT, index=df.index)
+    cre = df["created_at"] if "created_at" in df.columns else pd.Series(pd.NaT, index=df.index)
+    df["_ts"] = upd.fillna(cre)
+
+    df = df.sort_values(by=["company_name", "project_name", "_src_rank", "_ts"],
+                        ascending=[True, True, True, False])
+    df = df.drop_duplicates(subset=["company_name", "project_name"], keep="first").copy()
+    df = df.drop(columns=["_src_rank", "_ts"])
+
+    # Audit
+    df["ingested_at_utc"] = pd.Timestamp.now(tz=timezone.utc)
+    return df
+
+# ========== 5) Validasi ringkas ==========
+def validate(df: pd.DataFrame) -> Dict[str, int]:
+    issues = {}
+    bad_stage = df[~df["funnel_stage"].isin(ALLOWED_STAGES)]
+    if len(bad_stage) > 0:
+        issues["invalid_stage_rows"] = len(bad_stage)
+
+    if "est_revenue" in df.columns:
+        neg_rev = df[df["est_revenue"] < 0]
+        if len(neg_rev) > 0:
+            issues["negative_revenue_rows"] = len(neg_rev)
+
+    missing_created = df["created_at"].isna().sum()
+    if missing_created > 0:
+        issues["missing_created_at"] = int(missing_created)
+    return issues
+
+def print_summary(result: PipelineResult) -> None:
+    import numpy as np
+    import pandas as pd
+
+    df = result.df
+    print("\n=== VALIDATION SUMMARY ===")
+    print(f"Rows read                : {result.rows_read}")
+    print(f"Rows after drop key-null : {result.rows_after_drop_key}")
+    print(f"Rows after dedupe        : {len(df)}")
+    if result.issues:
+        for k, v in result.issues.items():
+            print(f"- {k}: {v}")
+    else:
+        print("- No critical issues found.")
+
+    print("\n=== QUICK STATS ===")
+    if "funnel_stage" in df.columns:
+        print("By funnel_stage:")
+        print(df["funnel_stage"].value_counts(dropna=False))
+    if "source_division" in df.columns:
+        print("\nBy source_division:")
+        print(df["source_division"].value_counts(dropna=False))
+
+    # —— Pretty print describe tanpa scientific notation, 3 desimal ——
+    if "est_revenue" in df.columns:
+        print("\nRevenue (est_revenue) describe:")
+        desc = df["est_revenue"].describe()
+        def _fmt(v):
+            if pd.isna(v):
+                return "NaN"
+            # tampilkan count sebagai integer dengan ribuan
+            if isinstance(v, (int, np.integer)) or (isinstance(v, float) and v.is_integer()):
+                return f"{int(v):,}"
+            # angka lain: ribuan + 3 desimal
+            return f"{float(v):,.3f}"
+        for k, v in desc.items():
+            print(f"{k:>6}  {_fmt(v)}")
+
+# ========== 6) Export hasil ==========
+def export(df: pd.DataFrame, output_dir: str) -> Tuple[List[str], List[Tuple[str, Exception]]]:
+    """Write CSV/XLSX/Parquet; returns (written paths, [(path, error)])."""
+    import pandas as pd
+
+    os.makedirs(output_dir, exist_ok=True)
+    df = df.copy()
+
+    # nama file: gunakan UTC lalu jadikan naive untuk string
+    ts = datetime.now(timezone.utc).replace(tzinfo=None).strftime("%Y%m%d-%H%M%S")
+
+    csv_path = os.path.join(output_dir, f"lop_clean_{ts}.csv")
+    xlsx_path = os.path.join(output_dir, f"lop_clean_{ts}.xlsx")
+    pq_path  = os.path.join(output_dir, f"lop_clean_{ts}.parquet")
+
+    written = []
+    failed = []
+
+    try:
+        df.to_csv(csv_path, index=False, encoding="utf-8")
+        written.append(csv_path)
+    except Exception as e:
+        failed.append((csv_path, e))
+
+    # sebelum to_excel: hilangkan timezone agar Excel tidak error
+    for col in df.select_dtypes(include=["datetimetz"]).columns:
+        try:
+            df[col] = df[col].dt.tz_convert(None)
+        except AttributeError:
+            df[col] = df[col].dt.tz_localize(None)
+
+    try:
+        with pd.ExcelWriter(xlsx_path, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False, sheet_name="cleaned")
+            # ringkasan sederhana (jika kolom tersedia)
+            try:
+                summary_stage = df.pivot_table(index="funnel_stage", values="project_name", aggfunc="count").rename(columns={"project_name":"rows"})
+                summary_src   = df.pivot_table(index="source_division", values="project_name", aggfunc="count").rename(columns={"project_name":"rows"})
+                summary_stage.to_excel(writer, sheet_name="summary", startrow=0)
+                summary_src.to_excel(writer,   sheet_name="summary", startrow=len(summary_stage)+3)
+            except Exception:
+                pass
+        written.append(xlsx_path)
+    except Exception as e:
+        failed.append((xlsx_path, e))
+
+    # Parquet (cepat untuk analitik lanjut)
     try:
-        df[col] = df[col].dt.tz_convert(None)
-    except AttributeError:
-        df[col] = df[col].dt.tz_localize(None)
-
-try:
-    with pd.ExcelWriter(xlsx_path, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="cleaned")
-        # ringkasan sederhana (jika kolom tersedia)
+        df.to_parquet(pq_path, index=False)
+        written.append(pq_path)
+    except Exception as e:
+        failed.append((pq_path, e))
+
+    return written, failed
+
+# ========== Pipeline ==========
+def run_frame(df: pd.DataFrame, est_win_year: int = 2026, template: Optional[str] = None) -> PipelineResult:
+    """canonicalize → clean → dedupe → validate on an in-memory frame (no I/O)."""
+    df = canonicalize(df)
+    rows_read = len(df)
+    df = clean(df, est_win_year=est_win_year, template=template)
+    rows_after_drop_key = len(df)
+    df = dedupe(df)
+    return PipelineResult(
+        df=df,
+        rows_read=rows_read,
+        rows_after_drop_key=rows_after_drop_key,
+        issues=validate(df),
+    )
+
+def run_pipeline(config: EtlConfig, write: bool = True) -> PipelineResult:
+    """Full pipeline: read_excel → … → export (skipped when write=False)."""
+    result = run_frame(read_excel(config), est_win_year=config.est_win_year)
+    if write:
+        result.written, result.failed = export(result.df, config.output_dir)
+    return result
+
+# ========== CLI ==========
+def build_parser() -> argparse.ArgumentParser:
+    env = EtlConfig.from_env()
+    parser = argparse.ArgumentParser(description="Clean a LOP workbook and export CSV/XLSX/Parquet.")
+    parser.add_argument("excel_path", nargs="?", default=env.excel_path, help="Workbook (default: $EXCEL_PATH)")
+    parser.add_argument("--output-dir", default=env.output_dir, help="Export directory (default: $OUTPUT_DIR)")
+    parser.add_argument("--sheet", default=env.sheet_name, help="Sheet name (default: first sheet)")
+    parser.add_argument("--header-row", type=int, default=env.header_row_one_based, help="1-based header row")
+    parser.add_argument("--est-win-year", type=int, default=env.est_win_year, help="Year for Est Win (mmm)")
+    parser.add_argument("--check", action="store_true", help="Validate config and exit without loading pandas")
+    parser.add_argument("--no-export", action="store_true", help="Run the pipeline but skip writing files")
+    return parser
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    config = EtlConfig(
+        excel_path=args.excel_path,
+        output_dir=args.output_dir,
+        sheet_name=args.sheet,
+        header_row_one_based=args.header_row,
+        est_win_year=args.est_win_year,
+    )
+
+    problems = config.validate()
+    if problems:
+        for p in problems:
+            print(f"Config error: {p}", file=sys.stderr)
+        return 2
+    if args.check:
+        print("Config OK.")
+        return 0
+
+    if not args.no_export:
         try:
-            summary_stage = df.pivot_table(index="funnel_stage", values="project_name", aggfunc="count").rename(columns={"project_name":"rows"})
-            summary_src   = df.pivot_table(index="source_division", values="project_name", aggfunc="count").rename(columns={"project_name":"rows"})
-            summary_stage.to_excel(writer, sheet_name="summary", startrow=0)
-            summary_src.to_excel(writer,   sheet_name="summary", startrow=len(summary_stage)+3)
-        except Exception:
-            pass
-    written.append(xlsx_path)
-except Exception as e:
-    failed.append((xlsx_path, e))
-
-# Parquet (cepat untuk analitik lanjut)
-try:
-    df.to_parquet(pq_path, index=False)
-    written.append(pq_path)
-except Exception as e:
-    failed.append((pq_path, e))
-
-print("\nSaved to:")
-for path in written:
-    print(f"- {path}")
-if failed:
-    print("\nSkipped/failed:")
-    for path, err in failed:
-        print(f"- {path}: {err}")
+            os.makedirs(config.output_dir, exist_ok=True)
+        except Exception as e:
+            print(f"Failed to create output dir {config.output_dir}: {e}")
+            return 1
+
+    print(f"Reading: {config.excel_path}")
+    result = run_pipeline(config, write=not args.no_export)
+    print_summary(result)
+
+    if result.written:
+        print("\nSaved to:")
+        for path in result.written:
+            print(f"- {path}")
+    if result.failed:
+        print("\nSkipped/failed:")
+        for path, err in result.failed:
+            print(f"- {path}: {err}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,8 +12,10 @@ import io
 import logging
 import os
 import sys
+import time
 import traceback
-from typing import Tuple
+from collections import defaultdict
+from typing import IO, Dict, List, Sequence, Tuple
 
 import datetime as dt
 
@@ -21,13 +23,32 @@ import numpy as np
 import pandas as pd
 import psycopg2
 from psycopg2.extras import DictCursor, Json, execute_values
-import requests
+
+import etl
+from date_parsing import parse_datetime_column, template_key
+from storage_client import StorageObject, get_storage_backend
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 BUCKET_NAME = "imports"
 
+# Same order as the dedupe policy in etl.py (best first).
+SOURCE_PRIORITY = ["BIDDING", "MSDC", "SALES", "MARKETING", "OTHER"]
+
+# How long batch mode keeps collecting newly queued imports before merging.
+BATCH_WINDOW_SECONDS = float(os.environ.get("ETL_BATCH_WINDOW_SECONDS", "5"))
+
+# Uploads from this division are leads lists and load into `leads`
+# instead of companies/opportunities.
+LEADS_DIVISION = "MSDC"
+
+# Staging lifecycle (see supabase/migrations/0002_staging_partitions.sql).
+STG_UNLOGGED = os.environ.get("STG_UNLOGGED", "").strip().lower() in ("1", "true", "yes")
+STG_RETENTION_DAYS = int(os.environ.get("STG_RETENTION_DAYS", "14"))
+# Daily partitions are created this many days ahead, outside any load.
+STG_PARTITION_DAYS_AHEAD = int(os.environ.get("STG_PARTITION_DAYS_AHEAD", "3"))
+
 
 # ---------------------------------------------------------------------------
 # Low-level helpers: DB + Storage
@@ -42,52 +63,38 @@ def get_db_connection() -> psycopg2.extensions.connection:
 
 
 def download_from_storage(storage_path: str, bucket: str = BUCKET_NAME) -> bytes:
-    """Download a file from Supabase Storage using the REST API.
+    """Download a file from storage and return its bytes.
 
-    Requires env vars:
-      - SUPABASE_URL
-      - SUPABASE_SERVICE_ROLE_KEY
+    Kept for callers that want raw bytes; the worker itself uses
+    `open_from_storage` so large files are spooled to disk.
     """
-    supabase_url = os.environ.get("SUPABASE_URL")
-    service_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    with open_from_storage(storage_path, bucket=bucket) as obj:
+        return obj.read_bytes()
 
-    if not supabase_url or not service_key:
-        raise RuntimeError(
-            "SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set in env "
-            "to download from storage."
-        )
 
-    # Use storage_path as stored in `imports.storage_path`, stripping
-    # only a leading slash if present.
-    path = storage_path.lstrip("/")
+def open_from_storage(storage_path: str, bucket: str = BUCKET_NAME) -> StorageObject:
+    """Stream a file from the configured storage backend (see storage_client).
 
-    # {SUPABASE_URL}/storage/v1/object/{bucket}/{path}
-    url = f"{supabase_url.rstrip('/')}/storage/v1/object/{bucket}/{path}"
-
-    headers = {
-        "Authorization": f"Bearer {service_key}",
-        "apikey": service_key,
-    }
-
-    resp = requests.get(url, headers=headers)
-    try:
-        resp.raise_for_status()
-    except requests.HTTPError as exc:
-        raise RuntimeError(
-            f"Failed to download from storage ({bucket}/{path}): "
-            f"{resp.status_code} {resp.text}"
-        ) from exc
-
-    return resp.content
+    Supabase Storage requires env vars:
+      - SUPABASE_URL
+      - SUPABASE_SERVICE_ROLE_KEY
+    Set STORAGE_BACKEND=local and STORAGE_LOCAL_ROOT to run offline.
+    """
+    return get_storage_backend().download(storage_path, bucket)
 
 
 def load_dataframe_from_bytes(file_bytes: bytes, storage_path: str) -> pd.DataFrame:
     """Route bytes to Pandas based on the file extension."""
+    return load_dataframe(io.BytesIO(file_bytes), storage_path)
+
+
+def load_dataframe(fileobj: IO[bytes], storage_path: str) -> pd.DataFrame:
+    """Route a binary file object to Pandas based on the file extension."""
     _, ext = os.path.splitext(storage_path.lower())
     if ext in (".xls", ".xlsx"):
-        return pd.read_excel(io.BytesIO(file_bytes))
+        return pd.read_excel(fileobj)
     if ext == ".csv":
-        return pd.read_csv(io.BytesIO(file_bytes))
+        return pd.read_csv(fileobj)
     raise ValueError(f"Unsupported file type: {ext}")
 
 
@@ -126,8 +133,12 @@ def canonicalize_project(name: str | None) -> str | None:
 
 
 def clean_and_normalize(df_raw: pd.DataFrame, division: str) -> pd.DataFrame:
-    """Minimal transformation from raw Excel/CSV to standardized columns."""
-    df = df_raw.copy()
+    """Minimal transformation from raw Excel/CSV to standardized columns.
+
+    Header aliases and stage labels go through the same `etl` stages as the
+    offline pipeline (`etl.canonicalize`, `etl.normalize_stage`).
+    """
+    df = etl.canonicalize(df_raw)
 
     # Map likely column headers into our standard names
     df["company_name"] = (
@@ -151,24 +162,46 @@ def clean_and_normalize(df_raw: pd.DataFrame, division: str) -> pd.DataFrame:
     # Division comes from imports.division (e.g. BIDDING / MSDC / SALES / MARKETING / OTHER)
     df["source_division"] = division
 
-    # Funnel stage: default to "leads"
-    df["funnel_stage"] = (
+    # Funnel stage: default to "leads". etl.canonicalize also maps Status /
+    # Stage / Tahap headers here, so values outside the funnel (e.g. "open")
+    # fall back to "leads" instead of reaching opportunities.stage.
+    stage = (
         pick_series(df, ["funnel_stage"], default="leads")
         .fillna("leads")
-        .astype(str)
-        .str.strip()
+        .map(etl.normalize_stage)
     )
+    unknown_stage = ~stage.isin(etl.ALLOWED_STAGES)
+    if unknown_stage.any():
+        logger.warning(
+            "%s: %d rows with unknown funnel stage %s mapped to 'leads'",
+            division,
+            int(unknown_stage.sum()),
+            sorted(stage[unknown_stage].astype(str).unique())[:5],
+        )
+    df["funnel_stage"] = stage.mask(unknown_stage, "leads")
 
-    # Revenue: try to coerce to numeric
+    # Revenue: numeric columns as-is; text ("1.250.000", "1.250.000,5",
+    # "2,000,000.5") via the thousands-aware etl.parse_money
     est = pick_series(df, ["est_revenue", "Est Revenue", "estimated_revenue"], default=np.nan)
-    df["est_revenue"] = pd.to_numeric(est, errors="coerce")
+    if pd.api.types.is_numeric_dtype(est):
+        df["est_revenue"] = est.astype("float64")
+    else:
+        df["est_revenue"] = est.map(etl.parse_money).astype("float64")
 
     # Segment (optional)
-    if "Segment" in df.columns:
-        df["segment"] = df["Segment"].astype(str).str.strip()
+    segment_col = next((c for c in ("segment", "Segment") if c in df.columns), None)
+    if segment_col:
+        df["segment"] = df[segment_col].astype(str).str.strip()
     else:
         df["segment"] = np.nan
 
+    # Created date: explicit per-template format, Excel serial fast path
+    df["created_at"] = parse_datetime_column(
+        pick_series(df, ["created_at", "Tanggal", "Created Date", "Date"], default=None),
+        template=template_key(df_raw.columns, prefix=division),
+        column="created_at",
+    )
+
     # Canonical names
     df["company_name_canonical"] = df["company_name"].apply(canonicalize_company)
     df["project_name_canonical"] = df["project_name"].apply(canonicalize_project)
@@ -185,9 +218,11 @@ def make_json_safe(df: pd.DataFrame) -> pd.DataFrame:
             return v.isoformat()
         return v
 
-    out = df.copy()
+    # Object columns: a typed (float/str) column would turn None back into NaN,
+    # which is not valid JSON.
+    out = df.astype(object)
     for col in out.columns:
-        out[col] = out[col].map(_to_safe)
+        out[col] = pd.Series([_to_safe(v) for v in out[col]], index=out.index, dtype=object)
     return out
 
 
@@ -195,6 +230,28 @@ def make_json_safe(df: pd.DataFrame) -> pd.DataFrame:
 # Staging inserts
 # ---------------------------------------------------------------------------
 
+def ensure_staging_partitions(conn, days_ahead: int = STG_PARTITION_DAYS_AHEAD) -> None:
+    """Create the stg_raw_rows / stg_clean_rows partitions for today and the
+    next `days_ahead` days in their own short transaction.
+
+    Creating a partition locks the parent table until commit, so this must
+    not run inside a staging/merge transaction.
+    """
+    with conn:
+        cur = conn.cursor()
+        for offset in range(days_ahead + 1):
+            cur.execute(
+                "SELECT ensure_stg_partitions(CURRENT_DATE + %s, %s)",
+                (offset, STG_UNLOGGED),
+            )
+
+
+def prune_staging_partitions(cur, retention_days: int = STG_RETENTION_DAYS) -> List[str]:
+    """Drop staging partitions older than `retention_days`; return their names."""
+    cur.execute("SELECT * FROM drop_stg_partitions_older_than(%s)", (retention_days,))
+    return [row[0] for row in cur.fetchall()]
+
+
 def insert_staging_raw(cur, import_id: str, tenant_id: str, df_raw: pd.DataFrame) -> int:
     """Insert raw rows into stg_raw_rows (jsonb payloads)."""
 
@@ -217,6 +274,13 @@ def insert_staging_raw(cur, import_id: str, tenant_id: str, df_raw: pd.DataFrame
     return len(records)
 
 
+def _none_if_nat(value):
+    """psycopg2 cannot adapt NaT; send NULL instead."""
+    if value is None or pd.isna(value):
+        return None
+    return value.to_pydatetime() if isinstance(value, pd.Timestamp) else value
+
+
 def insert_staging_clean(cur, import_id: str, tenant_id: str, df_clean: pd.DataFrame) -> int:
     """Insert cleaned rows into stg_clean_rows."""
     df = df_clean.copy()
@@ -236,6 +300,7 @@ def insert_staging_clean(cur, import_id: str, tenant_id: str, df_clean: pd.DataF
                 row.get("funnel_stage"),
                 row.get("est_revenue"),
                 row.get("segment"),
+                _none_if_nat(row.get("created_at")),
             )
         )
 
@@ -253,7 +318,8 @@ def insert_staging_clean(cur, import_id: str, tenant_id: str, df_clean: pd.DataF
           source_division,
           funnel_stage,
           est_revenue,
-          segment
+          segment,
+          created_at
         )
         VALUES %s
         """,
@@ -267,11 +333,36 @@ def insert_staging_clean(cur, import_id: str, tenant_id: str, df_clean: pd.DataF
 # Upserts into final tables
 # ---------------------------------------------------------------------------
 
-def upsert_dimension_tables(cur, tenant_id: str, import_id: str) -> None:
+def upsert_dimension_tables(cur, tenant_id: str, import_id: str) -> int:
     """
     Upsert data dari stg_clean_rows ke companies dan opportunities
-    untuk satu import_id dan tenant_id tertentu.
+    untuk satu import_id dan tenant_id tertentu. Returns the number of
+    opportunities written.
     """
+    return merge_staged_imports(cur, tenant_id, [import_id]).get(str(import_id), 0)
+
+
+def merge_staged_imports(cur, tenant_id: str, import_ids: Sequence[str]) -> Dict[str, int]:
+    """Set-based upsert of the union of staging rows for several imports.
+
+    Must run in the same transaction that staged the rows: the staging
+    filter uses `import_date = CURRENT_DATE` so only today's partition is
+    scanned.
+
+    `import_ids` must be ordered oldest first. Opportunities follow the ETL
+    dedupe policy both inside the batch and against stored rows: best
+    SOURCE_PRIORITY first, then the newest import, then the last row in the
+    file; an existing row is only overwritten by an equal or better source.
+    Companies carry no source, so the newest row wins. Either way, merging
+    imports one at a time or as one batch gives the same result. Rows are
+    fed to ON CONFLICT in key order so concurrent merges take row locks in
+    the same order.
+
+    Returns {import_id: opportunities written}. Winning rows that the
+    priority guard kept out (a better source is already stored) are not
+    counted and are logged per import.
+    """
+    ids = [str(i) for i in import_ids]
 
     # 1) Upsert companies
     #    - 1 company per (tenant_id, name_canonical)
@@ -283,64 +374,275 @@ def upsert_dimension_tables(cur, tenant_id: str, import_id: str) -> None:
           name_canonical,
           segment
         )
-        SELECT DISTINCT
-          %s::uuid AS tenant_id,
+        SELECT DISTINCT ON (sc.company_name_canonical)
+          %(tenant_id)s::uuid AS tenant_id,
           sc.company_name,
           sc.company_name_canonical,
           sc.segment
         FROM stg_clean_rows sc
-        WHERE sc.import_id = %s::uuid
+        WHERE sc.import_date = CURRENT_DATE
+          AND sc.import_id = ANY(%(import_ids)s::uuid[])
           AND sc.company_name IS NOT NULL
           AND sc.company_name_canonical IS NOT NULL
+        ORDER BY
+          sc.company_name_canonical,
+          array_position(%(import_ids)s::uuid[], sc.import_id) DESC,
+          sc.row_number DESC
         ON CONFLICT (tenant_id, name_canonical)
         DO UPDATE SET
           segment   = EXCLUDED.segment,
           updated_at = NOW();
         """,
-        (tenant_id, import_id),
+        _merge_params(tenant_id, ids),
     )
 
     # 2) Upsert opportunities
     #    - unik per (tenant_id, company_id, project_name_canonical)
     cur.execute(
         """
-        INSERT INTO opportunities (
+        WITH winners AS (
+          SELECT DISTINCT ON (c.id, sc.project_name_canonical)
+            sc.import_id,
+            c.id AS company_id,
+            sc.project_name,
+            sc.project_name_canonical,
+            sc.funnel_stage AS stage,
+            sc.est_revenue AS amount,
+            sc.source_division,
+            COALESCE(sc.created_at, NOW()) AS created_at
+          FROM stg_clean_rows sc
+          JOIN companies c
+            ON c.tenant_id      = %(tenant_id)s::uuid
+           AND c.name_canonical = sc.company_name_canonical
+          WHERE sc.import_date = CURRENT_DATE
+            AND sc.import_id = ANY(%(import_ids)s::uuid[])
+            AND sc.project_name IS NOT NULL
+            AND sc.project_name_canonical IS NOT NULL
+          ORDER BY
+            c.id,
+            sc.project_name_canonical,
+            COALESCE(array_position(%(priority)s::text[], sc.source_division), %(fallback_rank)s),
+            array_position(%(import_ids)s::uuid[], sc.import_id) DESC,
+            sc.row_number DESC
+        ),
+        upserted AS (
+          INSERT INTO opportunities (
+            tenant_id,
+            company_id,
+            project_name,
+            project_name_canonical,
+            stage,
+            amount,
+            source_division,
+            created_at
+          )
+          SELECT
+            %(tenant_id)s::uuid,
+            w.company_id,
+            w.project_name,
+            w.project_name_canonical,
+            w.stage,
+            w.amount,
+            w.source_division,
+            w.created_at
+          FROM winners w
+          ORDER BY w.company_id, w.project_name_canonical
+          ON CONFLICT (tenant_id, company_id, project_name_canonical)
+          DO UPDATE SET
+            stage                  = EXCLUDED.stage,
+            amount                 = EXCLUDED.amount,
+            source_division        = EXCLUDED.source_division,
+            project_name           = EXCLUDED.project_name,
+            project_name_canonical = EXCLUDED.project_name_canonical,
+            updated_at             = NOW()
+          WHERE COALESCE(array_position(%(priority)s::text[], EXCLUDED.source_division), %(fallback_rank)s)
+             <= COALESCE(array_position(%(priority)s::text[], opportunities.source_division), %(fallback_rank)s)
+          RETURNING company_id, project_name_canonical
+        )
+        SELECT
+          w.import_id::text AS import_id,
+          COUNT(u.company_id) AS merged,
+          COUNT(*) - COUNT(u.company_id) AS skipped
+        FROM winners w
+        LEFT JOIN upserted u
+          ON u.company_id = w.company_id
+         AND u.project_name_canonical = w.project_name_canonical
+        GROUP BY w.import_id
+        """,
+        _merge_params(tenant_id, ids),
+    )
+
+    merged = {import_id: 0 for import_id in ids}
+    for import_id, merged_rows, skipped_rows in cur.fetchall():
+        merged[import_id] = int(merged_rows)
+        if skipped_rows:
+            logger.info(
+                "Import %s: %s opportunities kept their stored higher-priority source",
+                import_id,
+                skipped_rows,
+            )
+    return merged
+
+
+def _merge_params(tenant_id: str, import_ids: Sequence[str]) -> dict:
+    return {
+        "tenant_id": tenant_id,
+        "import_ids": list(import_ids),
+        "priority": SOURCE_PRIORITY,
+        "fallback_rank": len(SOURCE_PRIORITY) + 1,
+    }
+
+
+# ---------------------------------------------------------------------------
+# MSDC leads
+# ---------------------------------------------------------------------------
+
+LEADS_COLUMN_CANDIDATES = {
+    "customer_name": ["customer_name", "Nama Lembaga", "Lembaga", "Nama Customer", "Customer", "Instansi"],
+    "pic": ["pic", "PIC", "Nama PIC", "Contact", "Kontak"],
+    "segment": ["segment", "Segment"],
+    "channel": ["channel", "Channel", "Sumber Leads", "Sumber"],
+    "need_description": ["need_description", "Keterangan Kebutuhan", "Kebutuhan", "Keterangan"],
+    "tender_name": ["tender_name", "Permintaan", "Nama Tender", "Tender"],
+    "status_tender": ["status_tender", "Status Tender", "Status"],
+}
+LEADS_VALUE_CANDIDATES = ["Nilai HPS", "nilai_hps", "HPS", "project_value_m"]
+LEADS_DATE_CANDIDATES = ["created_at", "Tanggal", "Tanggal Tender", "Date"]
+
+# Rupiah multiplier per unit suffix in "Nilai HPS" (e.g. "1,5 M", "750 Jt").
+HPS_UNITS = {
+    "T": 1e12, "TRILIUN": 1e12,
+    "M": 1e9, "MILIAR": 1e9, "MILYAR": 1e9,
+    "JT": 1e6, "JUTA": 1e6,
+}
+# Bare numbers (no unit, no Rp/IDR prefix, no thousands grouping) up to this
+# value are taken to be in M (miliar) already; larger ones are rupiah. No
+# tender is worth more than 10.000 M, while rupiah amounts are far above it.
+HPS_MAX_BARE_MILIAR = 10_000
+
+
+def pick_series_ci(df: pd.DataFrame, candidates, default=None) -> pd.Series:
+    """Like `pick_series`, but header matching ignores case and surrounding spaces."""
+    lower_cols = {str(c).strip().lower(): c for c in df.columns}
+    for col in candidates:
+        match = lower_cols.get(col.strip().lower())
+        if match is not None:
+            return df[match]
+    return pd.Series([default] * len(df), index=df.index, dtype=object)
+
+
+def parse_hps_to_m(values: pd.Series) -> pd.Series:
+    """Vectorized "Nilai HPS" → project_value_m (miliar rupiah).
+
+    Accepts numbers, "Rp 1.500.000.000", "IDR 1,250,000,000",
+    "Rp 150.000.000,-", "1,5 M", "750 Jt". Separators follow
+    `etl.parse_money`. Values with an Rp/IDR prefix or thousands grouping
+    are rupiah whatever their size ("Rp 150.000" is 0.00015 M); only bare
+    numbers go through the HPS_MAX_BARE_MILIAR heuristic, and rows it reads
+    as miliar are logged.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        parsed = values.astype("float64")
+        bare = parsed.notna()
+        rupiah = parsed
+    else:
+        text = values.astype("string").str.upper()
+        has_currency = text.str.contains(r"RP|IDR", regex=True).fillna(False)
+        text = text.str.replace(r"RP\.?|IDR|\s", "", regex=True)
+        unit = text.str.extract(r"(TRILIUN|MILIAR|MILYAR|JUTA|JT|M|T)\.?$", expand=False)
+        number = text.str.replace(r"(TRILIUN|MILIAR|MILYAR|JUTA|JT|M|T)\.?$", "", regex=True)
+        # "150.000.000,-" / "150.000.000,00": no fractional rupiah
+        number = number.str.replace(r"[.,]-$|,00$", "", regex=True)
+        number = number.str.replace(r"[^0-9.,-]", "", regex=True)
+
+        grouped = number.str.fullmatch(r"-?" + etl.MONEY_GROUPING_PATTERN).fillna(False)
+        parsed = etl.parse_money_series(number)
+        multiplier = unit.map(HPS_UNITS)
+        no_unit = multiplier.isna()
+        bare = no_unit & ~has_currency & ~grouped & parsed.notna()
+        rupiah = (parsed * multiplier).where(~no_unit, parsed)
+
+    as_miliar = bare & (parsed.abs() <= HPS_MAX_BARE_MILIAR)
+    if as_miliar.any():
+        logger.info(
+            "Nilai HPS: %d bare values <= %s read as miliar (e.g. %s)",
+            int(as_miliar.sum()),
+            HPS_MAX_BARE_MILIAR,
+            parsed[as_miliar].head(3).tolist(),
+        )
+    rupiah = rupiah.where(~as_miliar, parsed * 1e9)
+    return (rupiah / 1e9).astype("float64")
+
+
+def clean_leads(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """Map an MSDC leads sheet onto the `leads` columns."""
+    df_raw = df_raw.dropna(axis=0, how="all")
+    df = pd.DataFrame(index=df_raw.index)
+
+    for target, candidates in LEADS_COLUMN_CANDIDATES.items():
+        col = pick_series_ci(df_raw, candidates).astype("string").str.strip()
+        col = col.str.replace(r"\s+", " ", regex=True)
+        df[target] = col.mask(col == "").astype(object)
+
+    df["project_value_m"] = parse_hps_to_m(pick_series_ci(df_raw, LEADS_VALUE_CANDIDATES))
+    df["created_at"] = parse_datetime_column(
+        pick_series_ci(df_raw, LEADS_DATE_CANDIDATES),
+        template=template_key(df_raw.columns, prefix=LEADS_DIVISION),
+        column="created_at",
+    )
+
+    # A lead needs at least a customer or a tender name
+    return df[df["customer_name"].notna() | df["tender_name"].notna()]
+
+
+def load_leads(cur, import_id: str, tenant_id: str, df_leads: pd.DataFrame) -> int:
+    """Bulk-load cleaned leads; re-running an import replaces its rows.
+
+    `search_text` is filled by the leads_search_text_trg trigger
+    (0003_leads_search.sql).
+    """
+    cur.execute("DELETE FROM leads WHERE import_id = %s::uuid", (import_id,))
+
+    columns = [
+        "customer_name",
+        "pic",
+        "segment",
+        "channel",
+        "need_description",
+        "tender_name",
+        "project_value_m",
+        "status_tender",
+        "created_at",
+    ]
+    frame = df_leads[columns].astype(object).where(df_leads[columns].notna(), None)
+    rows = [
+        (tenant_id, import_id, *values[:-1], _none_if_nat(values[-1]))
+        for values in frame.itertuples(index=False, name=None)
+    ]
+
+    execute_values(
+        cur,
+        """
+        INSERT INTO leads (
           tenant_id,
-          company_id,
-          project_name,
-          project_name_canonical,
-          stage,
-          amount,
-          source_division,
+          import_id,
+          customer_name,
+          pic,
+          segment,
+          channel,
+          need_description,
+          tender_name,
+          project_value_m,
+          status_tender,
           created_at
         )
-        SELECT
-          %s::uuid AS tenant_id,
-          c.id AS company_id,
-          sc.project_name,
-          sc.project_name_canonical,
-          sc.funnel_stage AS stage,
-          sc.est_revenue AS amount,
-          sc.source_division,
-          COALESCE(sc.created_at, NOW())
-        FROM stg_clean_rows sc
-        JOIN companies c
-          ON c.tenant_id      = %s::uuid
-         AND c.name_canonical = sc.company_name_canonical
-        WHERE sc.import_id = %s::uuid
-          AND sc.project_name IS NOT NULL
-          AND sc.project_name_canonical IS NOT NULL
-        ON CONFLICT (tenant_id, company_id, project_name_canonical)
-        DO UPDATE SET
-          stage                  = EXCLUDED.stage,
-          amount                 = EXCLUDED.amount,
-          source_division        = EXCLUDED.source_division,
-          project_name           = EXCLUDED.project_name,
-          project_name_canonical = EXCLUDED.project_name_canonical,
-          updated_at             = NOW();
+        VALUES %s
         """,
-        (tenant_id, tenant_id, import_id),
+        rows,
+        template="(%s::uuid, %s::uuid, %s, %s, %s, %s, %s, %s, %s, %s, COALESCE(%s::timestamptz, NOW()))",
+        page_size=1000,
     )
+    return len(rows)
 
 
 # ---------------------------------------------------------------------------
@@ -364,6 +666,29 @@ def lock_import(cur, import_id: str) -> Tuple[str, str, str]:
     return row["tenant_id"], row["storage_path"], row["division"]
 
 
+def claim_queued_imports(cur, tenant_id: str | None = None) -> List[dict]:
+    """Lock every QUEUED import (optionally for one tenant) and mark it RUNNING.
+
+    Rows already locked by another worker are skipped, so several batch
+    workers can run side by side without claiming the same import.
+    """
+    cur.execute(
+        """
+        SELECT id, tenant_id, storage_path, division
+        FROM imports
+        WHERE status = 'QUEUED'
+          AND (%s::uuid IS NULL OR tenant_id = %s::uuid)
+        ORDER BY created_at, id
+        FOR UPDATE SKIP LOCKED
+        """,
+        (tenant_id, tenant_id),
+    )
+    rows = [dict(r) for r in cur.fetchall()]
+    for r in rows:
+        mark_status(cur, r["id"], "RUNNING", error_log=None)
+    return rows
+
+
 def mark_status(
     cur,
     import_id: str,
@@ -390,29 +715,52 @@ def mark_status(
 # Orchestration
 # ---------------------------------------------------------------------------
 
+def prepare_import(storage_path: str, division: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Download + parse + clean one import; returns (df_raw, df_clean).
+
+    For LEADS_DIVISION, df_clean has the `leads` columns (see clean_leads).
+    """
+    with open_from_storage(storage_path, bucket=BUCKET_NAME) as obj:
+        df_raw = load_dataframe(obj.file, storage_path)
+    if division == LEADS_DIVISION:
+        df_clean = clean_leads(df_raw)
+    else:
+        df_clean = clean_and_normalize(df_raw, division)
+    return df_raw, df_clean
+
+
+def fail_import(conn, import_id: str, error_log: str) -> None:
+    """Record a failed import in its own transaction."""
+    logger.error("Import %s failed:\n%s", import_id, error_log)
+    with conn:
+        cur = conn.cursor()
+        mark_status(cur, import_id, "FAILED", error_log=error_log)
+
+
 def run_import(import_id: str) -> None:
     """Run ETL for a single import_id."""
     conn = get_db_connection()
     try:
+        ensure_staging_partitions(conn)
         with conn:
             cur = conn.cursor()
             tenant_id, storage_path, division = lock_import(cur, import_id)
             mark_status(cur, import_id, "RUNNING", error_log=None)
 
         # Download + parse file (outside transaction)
-        file_bytes = download_from_storage(storage_path, bucket=BUCKET_NAME)
-        df_raw = load_dataframe_from_bytes(file_bytes, storage_path)
+        df_raw, df_clean = prepare_import(storage_path, division)
         rows_in = len(df_raw)
 
-        df_clean = clean_and_normalize(df_raw, division)
-        rows_out = len(df_clean)
-
-        # Staging + upserts (inside transaction)
+        # Staging + upserts (inside transaction); rows_out counts the rows
+        # actually written to leads / opportunities.
         with conn:
             cur = conn.cursor()
             insert_staging_raw(cur, import_id, tenant_id, df_raw)
-            insert_staging_clean(cur, import_id, tenant_id, df_clean)
-            upsert_dimension_tables(cur, tenant_id, import_id)
+            if division == LEADS_DIVISION:
+                rows_out = load_leads(cur, import_id, tenant_id, df_clean)
+            else:
+                insert_staging_clean(cur, import_id, tenant_id, df_clean)
+                rows_out = upsert_dimension_tables(cur, tenant_id, import_id)
             mark_status(
                 cur,
                 import_id,
@@ -443,7 +791,156 @@ def run_import(import_id: str) -> None:
             conn.close()
 
 
+def _stage_prepared(cur, tenant_id: str, import_id: str, is_leads: bool, df_raw, df_clean) -> int:
+    """Stage one prepared import (or load it into `leads` for LEADS_DIVISION).
+
+    Returns the rows loaded into `leads` (0 for imports that still need a merge).
+    """
+    insert_staging_raw(cur, import_id, tenant_id, df_raw)
+    if is_leads:
+        return load_leads(cur, import_id, tenant_id, df_clean)
+    insert_staging_clean(cur, import_id, tenant_id, df_clean)
+    return 0
+
+
+def _mark_success(cur, import_id: str, df_raw, rows_out: int) -> None:
+    mark_status(
+        cur,
+        import_id,
+        "SUCCESS",
+        rows_in=len(df_raw),
+        rows_out=rows_out,
+        error_log=None,
+    )
+
+
+def run_tenant_batch(conn, tenant_id: str, imports: Sequence[dict]) -> None:
+    """Stage several claimed imports of one tenant and merge them at once.
+
+    Each import is staged under its own SAVEPOINT, so a file whose rows are
+    rejected fails alone. If the combined merge then fails, the batch is
+    rolled back and retried one import per transaction, so only the import
+    that really breaks is marked FAILED. Each import keeps its own
+    rows_in/rows_out; rows_out counts the opportunities the merge wrote
+    from that import (a row superseded by a newer import in the same batch
+    counts for the newer one). LEADS_DIVISION imports load into `leads` in
+    the same transaction and are left out of the merge.
+    """
+    prepared = []
+    for imp in imports:
+        try:
+            df_raw, df_clean = prepare_import(imp["storage_path"], imp["division"])
+        except Exception:
+            fail_import(conn, imp["id"], traceback.format_exc())
+            continue
+        prepared.append((str(imp["id"]), imp["division"] == LEADS_DIVISION, df_raw, df_clean))
+
+    if not prepared:
+        return
+
+    failed: Dict[str, str] = {}
+    rows_out: Dict[str, int] = {}
+    try:
+        with conn:
+            cur = conn.cursor()
+            staged = []
+            for item in prepared:
+                cur.execute("SAVEPOINT stage_import")
+                try:
+                    rows_out[item[0]] = _stage_prepared(cur, tenant_id, *item)
+                except Exception:
+                    cur.execute("ROLLBACK TO SAVEPOINT stage_import")
+                    failed[item[0]] = traceback.format_exc()
+                    continue
+                cur.execute("RELEASE SAVEPOINT stage_import")
+                staged.append(item)
+
+            merge_ids = [import_id for import_id, is_leads, _, _ in staged if not is_leads]
+            if merge_ids:
+                rows_out.update(merge_staged_imports(cur, tenant_id, merge_ids))
+            for import_id, _, df_raw, _ in staged:
+                _mark_success(cur, import_id, df_raw, rows_out[import_id])
+    except Exception:
+        rows_out.clear()
+        logger.warning(
+            "Tenant %s batch merge failed; retrying imports one by one:\n%s",
+            tenant_id,
+            traceback.format_exc(),
+        )
+        for import_id, is_leads, df_raw, df_clean in [item for item in prepared if item[0] not in failed]:
+            try:
+                with conn:
+                    cur = conn.cursor()
+                    loaded = _stage_prepared(cur, tenant_id, import_id, is_leads, df_raw, df_clean)
+                    if not is_leads:
+                        loaded = merge_staged_imports(cur, tenant_id, [import_id])[import_id]
+                    _mark_success(cur, import_id, df_raw, loaded)
+                rows_out[import_id] = loaded
+            except Exception:
+                failed[import_id] = traceback.format_exc()
+
+    for import_id, error_log in failed.items():
+        fail_import(conn, import_id, error_log)
+
+    logger.info(
+        "Tenant %s batch completed: imports=%s failed=%s rows_out=%s",
+        tenant_id,
+        len(prepared) - len(failed),
+        len(failed),
+        sum(rows_out.values()),
+    )
+
+
+def run_batch(window_seconds: float = BATCH_WINDOW_SECONDS, tenant_id: str | None = None) -> int:
+    """Claim queued imports, keep collecting for `window_seconds`, then merge
+    them with one set-based upsert per tenant. Returns the number claimed."""
+    conn = get_db_connection()
+    try:
+        ensure_staging_partitions(conn)
+        with conn:
+            claimed = claim_queued_imports(conn.cursor(), tenant_id)
+        if claimed and window_seconds > 0:
+            time.sleep(window_seconds)
+            with conn:
+                claimed += claim_queued_imports(conn.cursor(), tenant_id)
+
+        by_tenant: Dict[str, List[dict]] = defaultdict(list)
+        for imp in claimed:
+            by_tenant[str(imp["tenant_id"])].append(imp)
+
+        for batch_tenant, imports in by_tenant.items():
+            run_tenant_batch(conn, batch_tenant, imports)
+        return len(claimed)
+    finally:
+        conn.close()
+
+
+def run_prune(retention_days: int = STG_RETENTION_DAYS) -> List[str]:
+    """Retention job: drop whole staging partitions older than N days and
+    pre-create the upcoming ones."""
+    conn = get_db_connection()
+    try:
+        with conn:
+            dropped = prune_staging_partitions(conn.cursor(), retention_days)
+        ensure_staging_partitions(conn)
+        logger.info("Dropped %s staging partitions: %s", len(dropped), dropped)
+        return dropped
+    finally:
+        conn.close()
+
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        sys.exit("Usage: python etl_worker.py <import_id>")
-    run_import(sys.argv[1])
+        sys.exit(
+            "Usage: python etl_worker.py <import_id>\n"
+            "       python etl_worker.py --batch [window_seconds] [tenant_id]\n"
+            "       python etl_worker.py --prune-staging [retention_days]"
+        )
+    if sys.argv[1] == "--batch":
+        window = float(sys.argv[2]) if len(sys.argv) > 2 else BATCH_WINDOW_SECONDS
+        tenant = sys.argv[3] if len(sys.argv) > 3 else None
+        run_batch(window, tenant)
+    elif sys.argv[1] == "--prune-staging":
+        run_prune(int(sys.argv[2]) if len(sys.argv) > 2 else STG_RETENTION_DAYS)
+    else:
+        run_import(sys.argv[1])
@@ -0,0 +1,298 @@
+"""Offline analytical queries over the Parquet snapshots written by `etl.py`.
+
+Analysts can break the cleaned LOP history down by funnel stage, segment and
+source division without touching the production Postgres that serves the
+dashboard. Queries run on an embedded DuckDB connection that reads the
+`lop_clean_*.parquet` files in OUTPUT_DIR directly (columnar scan, no load
+step), so they work fully offline.
+
+Results are cached per dataset version: the version is derived from the
+name, size and mtime of the Parquet files in scope, so a new ETL export
+invalidates the cache automatically.
+
+Usage:
+  python lop_query.py funnel [--year 2026] [--month-from 1 --month-to 6]
+  python lop_query.py segments
+  python lop_query.py sources [--stage qualified]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_OUTPUT_DIR = Path(__file__).parent.resolve() / "output"
+PARQUET_GLOB = "lop_clean_*.parquet"
+
+# Same unit as `total_m` in vw_funnel_kpi_per_segment / funnel-2rows route.
+AMOUNT_DIVISOR = 1_000_000
+
+STAGE_ORDER = ["leads", "prospect", "qualified", "submission", "win"]
+
+# etl.py keeps out-of-funnel stages (e.g. "open"; validate only counts them),
+# but the view only has funnel rows, so every aggregation filters on this.
+IN_FUNNEL_SQL = "funnel_stage IN (" + ", ".join(f"'{s}'" for s in STAGE_ORDER) + ")"
+
+
+# ---------------------------------------------------------------------------
+# Dataset discovery + versioning
+# ---------------------------------------------------------------------------
+
+def discover_parquet(output_dir: str | Path, latest_only: bool = True) -> List[Path]:
+    """Return the ETL Parquet exports in `output_dir`, oldest first.
+
+    Every `etl.py` run writes a full cleaned snapshot, so by default only the
+    newest file is used; unioning snapshots would double-count projects.
+    """
+    paths = sorted(Path(output_dir).glob(PARQUET_GLOB))
+    if not paths:
+        raise FileNotFoundError(f"No {PARQUET_GLOB} files found in {output_dir}")
+    return paths[-1:] if latest_only else paths
+
+
+def dataset_version(paths: Sequence[Path]) -> str:
+    """Cheap fingerprint of a set of Parquet files (name + size + mtime)."""
+    h = hashlib.sha1()
+    for p in paths:
+        st = p.stat()
+        h.update(f"{p.name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()[:16]
+
+
+def _connect():
+    """Open an in-memory DuckDB connection (imported lazily)."""
+    try:
+        import duckdb
+    except ImportError as exc:
+        raise RuntimeError(
+            "duckdb is required for lop_query; install it with `pip install duckdb`."
+        ) from exc
+    return duckdb.connect(database=":memory:")
+
+
+# ---------------------------------------------------------------------------
+# Query engine
+# ---------------------------------------------------------------------------
+
+class LopQueryEngine:
+    """Embedded DuckDB engine bound to the ETL Parquet exports.
+
+    The `lop` view is re-pointed whenever the dataset version changes; the
+    result cache is keyed on (version, query, params).
+    """
+
+    def __init__(
+        self,
+        output_dir: str | Path = DEFAULT_OUTPUT_DIR,
+        paths: Optional[Sequence[str | Path]] = None,
+        latest_only: bool = True,
+    ) -> None:
+        self.output_dir = Path(output_dir)
+        self.explicit_paths = [Path(p) for p in paths] if paths else None
+        self.latest_only = latest_only
+        self.version: Optional[str] = None
+        self.columns: set[str] = set()
+        self._con = _connect()
+        self._cache: Dict[Tuple[Any, ...], Any] = {}
+
+    def close(self) -> None:
+        self._con.close()
+
+    def __enter__(self) -> "LopQueryEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -- dataset binding ---------------------------------------------------
+
+    def _paths(self) -> List[Path]:
+        if self.explicit_paths:
+            return self.explicit_paths
+        return discover_parquet(self.output_dir, latest_only=self.latest_only)
+
+    def refresh(self) -> str:
+        """Bind the `lop` view to the current files; drop stale cache entries."""
+        paths = self._paths()
+        version = dataset_version(paths)
+        if version == self.version:
+            return version
+
+        file_list = ", ".join("'" + str(p).replace("'", "''") + "'" for p in paths)
+        self._con.execute(
+            f"CREATE OR REPLACE VIEW lop AS "
+            f"SELECT * FROM read_parquet([{file_list}], union_by_name = true)"
+        )
+        self.columns = {row[0] for row in self._con.execute("DESCRIBE lop").fetchall()}
+        self._cache = {k: v for k, v in self._cache.items() if k[0] == version}
+        self.version = version
+        return version
+
+    def _col(self, name: str, fallback: str = "NULL") -> str:
+        """Column reference, or `fallback` when the export lacks the column."""
+        return name if name in self.columns else fallback
+
+    def _run(self, key: Tuple[Any, ...], sql: str, params: Sequence[Any] = ()):
+        version = self.refresh()
+        cache_key = (version,) + key
+        if cache_key not in self._cache:
+            self._cache[cache_key] = self._con.execute(sql, list(params)).df()
+        return self._cache[cache_key].copy()
+
+    def _period_filter(
+        self,
+        year: Optional[int],
+        month_from: Optional[int],
+        month_to: Optional[int],
+    ) -> Tuple[str, List[Any]]:
+        created = self._col("created_at", "NULL::TIMESTAMP")
+        clauses: List[str] = []
+        params: List[Any] = []
+        if year is not None:
+            clauses.append(f"year({created}) = ?")
+            params.append(year)
+        if month_from is not None:
+            clauses.append(f"month({created}) >= ?")
+            params.append(month_from)
+        if month_to is not None:
+            clauses.append(f"month({created}) <= ?")
+            params.append(month_to)
+        return (" AND ".join(clauses) or "TRUE"), params
+
+    # -- ready-made aggregations ------------------------------------------
+
+    def funnel_per_segment(
+        self,
+        year: Optional[int] = None,
+        month_from: Optional[int] = None,
+        month_to: Optional[int] = None,
+    ):
+        """Rows at the grain of `vw_funnel_kpi_per_segment`: one per (segment, stage).
+
+        Columns: segment, stage, project_count, total_m. The period arguments
+        only filter on created_at; they do not split the rows.
+        """
+        self.refresh()
+        where, params = self._period_filter(year, month_from, month_to)
+        sql = f"""
+            SELECT
+              {self._col("segment", "NULL::VARCHAR")} AS segment,
+              funnel_stage AS stage,
+              COUNT(*) AS project_count,
+              COALESCE(SUM({self._col("est_revenue", "0")}), 0) / {AMOUNT_DIVISOR} AS total_m
+            FROM lop
+            WHERE {IN_FUNNEL_SQL} AND {where}
+            GROUP BY 1, 2
+            ORDER BY segment, {_stage_order_sql("stage")}
+        """
+        return self._run(("funnel", year, month_from, month_to), sql, params)
+
+    def segment_summary(
+        self,
+        year: Optional[int] = None,
+        month_from: Optional[int] = None,
+        month_to: Optional[int] = None,
+    ):
+        """One row per segment with project counts and value per stage.
+
+        project_count / total_m are the sums of the per-stage columns.
+        """
+        self.refresh()
+        where, params = self._period_filter(year, month_from, month_to)
+        revenue = self._col("est_revenue", "0")
+        stage_cols = ",\n".join(
+            f"COUNT(*) FILTER (WHERE funnel_stage = '{s}') AS {s}_projects,\n"
+            f"COALESCE(SUM({revenue}) FILTER (WHERE funnel_stage = '{s}'), 0)"
+            f" / {AMOUNT_DIVISOR} AS {s}_m"
+            for s in STAGE_ORDER
+        )
+        sql = f"""
+            SELECT
+              {self._col("segment", "NULL::VARCHAR")} AS segment,
+              COUNT(*) AS project_count,
+              COALESCE(SUM({revenue}), 0) / {AMOUNT_DIVISOR} AS total_m,
+              {stage_cols}
+            FROM lop
+            WHERE {IN_FUNNEL_SQL} AND {where}
+            GROUP BY 1
+            ORDER BY total_m DESC
+        """
+        return self._run(("segments", year, month_from, month_to), sql, params)
+
+    def source_division_breakdown(
+        self,
+        stage: Optional[str] = None,
+        year: Optional[int] = None,
+        month_from: Optional[int] = None,
+        month_to: Optional[int] = None,
+    ):
+        """Project count and value per (source_division, stage)."""
+        self.refresh()
+        where, params = self._period_filter(year, month_from, month_to)
+        if stage is not None:
+            where += " AND funnel_stage = ?"
+            params.append(stage)
+        sql = f"""
+            SELECT
+              source_division,
+              funnel_stage AS stage,
+              COUNT(*) AS project_count,
+              COALESCE(SUM({self._col("est_revenue", "0")}), 0) / {AMOUNT_DIVISOR} AS total_m
+            FROM lop
+            WHERE {IN_FUNNEL_SQL} AND {where}
+            GROUP BY 1, 2
+            ORDER BY source_division, {_stage_order_sql("stage")}
+        """
+        return self._run(("sources", stage, year, month_from, month_to), sql, params)
+
+
+def _stage_order_sql(column: str) -> str:
+    cases = " ".join(f"WHEN '{s}' THEN {i}" for i, s in enumerate(STAGE_ORDER))
+    return f"CASE {column} {cases} ELSE {len(STAGE_ORDER)} END"
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("query", choices=["funnel", "segments", "sources"])
+    parser.add_argument("--output-dir", default=os.getenv("OUTPUT_DIR", str(DEFAULT_OUTPUT_DIR)))
+    parser.add_argument("--parquet", nargs="*", help="Explicit Parquet file(s) instead of the latest export")
+    parser.add_argument("--all-snapshots", action="store_true", help="Union every export, not just the latest")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--month-from", type=int)
+    parser.add_argument("--month-to", type=int)
+    parser.add_argument("--stage", help="Stage filter for `sources`")
+    parser.add_argument("--csv", help="Write the result to this CSV path instead of printing")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    period = dict(year=args.year, month_from=args.month_from, month_to=args.month_to)
+
+    with LopQueryEngine(args.output_dir, paths=args.parquet, latest_only=not args.all_snapshots) as engine:
+        if args.query == "funnel":
+            result = engine.funnel_per_segment(**period)
+        elif args.query == "segments":
+            result = engine.segment_summary(**period)
+        else:
+            result = engine.source_division_breakdown(stage=args.stage, **period)
+
+        if args.csv:
+            result.to_csv(args.csv, index=False)
+            print(f"Saved {len(result)} rows to {args.csv} (dataset {engine.version})")
+        else:
+            print(f"dataset version: {engine.version}")
+            print(result.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""Storage client used by the ETL worker to fetch uploaded import files.
+
+Two backends share one interface:
+
+- `SupabaseStorageBackend`: Supabase Storage REST API over a pooled
+  keep-alive `requests.Session`, with streamed downloads, timeouts, and
+  integrity checks; transient errors and integrity mismatches are retried
+  with exponential backoff.
+- `LocalStorageBackend`: reads `<root>/<bucket>/<path>` from disk, so the
+  worker can run fully offline against a directory that stands in for
+  Supabase Storage.
+
+Downloads are spooled: objects stay in memory up to SPOOL_MAX_BYTES and are
+rolled over to a temporary file above that.
+
+Env vars:
+  - STORAGE_BACKEND          "supabase" (default) or "local"
+  - STORAGE_LOCAL_ROOT       root directory for the local backend
+  - SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY   for the Supabase backend
+  - STORAGE_TIMEOUT_SECONDS, STORAGE_MAX_RETRIES, STORAGE_SPOOL_MAX_BYTES
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Optional
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_SECONDS = float(os.environ.get("STORAGE_TIMEOUT_SECONDS", "30"))
+MAX_RETRIES = int(os.environ.get("STORAGE_MAX_RETRIES", "3"))
+BACKOFF_SECONDS = 0.5
+SPOOL_MAX_BYTES = int(os.environ.get("STORAGE_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+CHUNK_SIZE = 256 * 1024
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class StorageError(RuntimeError):
+    """Download failed permanently (missing object, auth, integrity, retries exhausted)."""
+
+
+class IntegrityError(StorageError):
+    """Downloaded bytes do not match the expected size or digest."""
+
+
+@dataclass
+class StorageObject:
+    """A downloaded object: seekable file positioned at 0 plus its digests."""
+
+    file: IO[bytes]
+    size: int
+    sha256: str
+    md5: str
+
+    def read_bytes(self) -> bytes:
+        self.file.seek(0)
+        data = self.file.read()
+        self.file.seek(0)
+        return data
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "StorageObject":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _spool(chunks, spool_max_bytes: int) -> StorageObject:
+    """Copy byte chunks into a SpooledTemporaryFile while hashing them."""
+    buf = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes, mode="w+b")
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    size = 0
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            buf.write(chunk)
+            sha256.update(chunk)
+            md5.update(chunk)
+            size += len(chunk)
+    except BaseException:
+        buf.close()
+        raise
+    buf.seek(0)
+    return StorageObject(file=buf, size=size, sha256=sha256.hexdigest(), md5=md5.hexdigest())
+
+
+def _verify(obj: StorageObject, label: str, expected_sha256: Optional[str] = None,
+            expected_size: Optional[int] = None, expected_md5: Optional[str] = None) -> None:
+    problems = []
+    if expected_size is not None and obj.size != expected_size:
+        problems.append(f"size {obj.size} != {expected_size}")
+    if expected_md5 is not None and obj.md5 != expected_md5.lower():
+        problems.append(f"md5 {obj.md5} != {expected_md5}")
+    if expected_sha256 is not None and obj.sha256 != expected_sha256.lower():
+        problems.append(f"sha256 {obj.sha256} != {expected_sha256}")
+    if problems:
+        obj.close()
+        raise IntegrityError(f"Integrity check failed for {label}: " + "; ".join(problems))
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+class LocalStorageBackend:
+    """Filesystem stand-in for Supabase Storage: `<root>/<bucket>/<path>`."""
+
+    def __init__(self, root: str | Path, spool_max_bytes: int = SPOOL_MAX_BYTES) -> None:
+        self.root = Path(root).resolve()
+        self.spool_max_bytes = spool_max_bytes
+
+    def _resolve(self, bucket: str, storage_path: str) -> Path:
+        path = (self.root / bucket / storage_path.lstrip("/")).resolve()
+        if self.root not in path.parents:
+            raise StorageError(f"Path escapes storage root: {bucket}/{storage_path}")
+        return path
+
+    def download(self, storage_path: str, bucket: str, expected_sha256: Optional[str] = None) -> StorageObject:
+        path = self._resolve(bucket, storage_path)
+        if not path.is_file():
+            raise StorageError(f"Object not found in local storage: {bucket}/{storage_path}")
+        with path.open("rb") as fh:
+            obj = _spool(iter(lambda: fh.read(CHUNK_SIZE), b""), self.spool_max_bytes)
+        _verify(obj, f"{bucket}/{storage_path}", expected_sha256=expected_sha256)
+        return obj
+
+    def upload(self, storage_path: str, bucket: str, fileobj: IO[bytes]) -> None:
+        path = self._resolve(bucket, storage_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as out:
+            shutil.copyfileobj(fileobj, out, CHUNK_SIZE)
+
+
+class SupabaseStorageBackend:
+    """Supabase Storage REST client with one pooled keep-alive session."""
+
+    def __init__(
+        self,
+        supabase_url: str,
+        service_key: str,
+        timeout: float = TIMEOUT_SECONDS,
+        max_retries: int = MAX_RETRIES,
+        backoff: float = BACKOFF_SECONDS,
+        spool_max_bytes: int = SPOOL_MAX_BYTES,
+        pool_size: int = 10,
+    ) -> None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = supabase_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.spool_max_bytes = spool_max_bytes
+
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {service_key}", "apikey": service_key})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def download(self, storage_path: str, bucket: str, expected_sha256: Optional[str] = None) -> StorageObject:
+        import requests
+
+        path = storage_path.lstrip("/")
+        label = f"{bucket}/{path}"
+        # {SUPABASE_URL}/storage/v1/object/{bucket}/{path}
+        url = f"{self.base_url}/storage/v1/object/{bucket}/{path}"
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.session.get(url, stream=True, timeout=self.timeout) as resp:
+                    if resp.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+                        raise _Retryable(f"{resp.status_code} {resp.reason}")
+                    if resp.status_code >= 400:
+                        raise StorageError(
+                            f"Failed to download from storage ({label}): {resp.status_code} {resp.text}"
+                        )
+                    obj = _spool(resp.iter_content(CHUNK_SIZE), self.spool_max_bytes)
+                    expected_size = _int_or_none(resp.headers.get("Content-Length"))
+                    if resp.headers.get("Content-Encoding"):
+                        expected_size = None  # length refers to the encoded body
+                    _verify(
+                        obj,
+                        label,
+                        expected_sha256=expected_sha256,
+                        expected_size=expected_size,
+                        expected_md5=_etag_md5(resp.headers.get("ETag")),
+                    )
+                    return obj
+            except (_Retryable, IntegrityError, requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as exc:
+                # A truncated or corrupted body is usually a dropped connection;
+                # fetch it again like any other transient failure.
+                if attempt >= self.max_retries:
+                    raise StorageError(f"Giving up on {label} after {attempt + 1} attempts: {exc}") from exc
+                delay = self.backoff * (2 ** attempt)
+                logger.warning("Storage download %s failed (%s); retrying in %.1fs", label, exc, delay)
+                time.sleep(delay)
+        raise StorageError(f"Failed to download {label}")  # pragma: no cover
+
+
+class _Retryable(Exception):
+    pass
+
+
+def _int_or_none(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _etag_md5(etag: Optional[str]) -> Optional[str]:
+    """Plain (non-multipart) S3-style ETags are the MD5 of the body."""
+    if not etag:
+        return None
+    value = etag.strip().removeprefix("W/").strip('"')
+    if len(value) == 32 and all(c in "0123456789abcdefABCDEF" for c in value):
+        return value
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Factory
+# ---------------------------------------------------------------------------
+
+_default_backend = None
+
+
+def get_storage_backend():
+    """Process-wide backend selected by STORAGE_BACKEND (created once, reused)."""
+    global _default_backend
+    if _default_backend is not None:
+        return _default_backend
+
+    kind = os.environ.get("STORAGE_BACKEND", "supabase").strip().lower()
+    if kind == "local":
+        root = os.environ.get("STORAGE_LOCAL_ROOT")
+        if not root:
+            raise RuntimeError("Set STORAGE_LOCAL_ROOT to use the local storage backend.")
+        _default_backend = LocalStorageBackend(root)
+    elif kind == "supabase":
+        supabase_url = os.environ.get("SUPABASE_URL")
+        service_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+        if not supabase_url or not service_key:
+            raise RuntimeError(
+                "SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set in env "
+                "to download from storage."
+            )
+        _default_backend = SupabaseStorageBackend(supabase_url, service_key)
+    else:
+        raise RuntimeError(f"Unknown STORAGE_BACKEND: {kind!r} (expected 'supabase' or 'local')")
+    return _default_backend
+
+
+def set_storage_backend(backend) -> None:
+    """Override the process-wide backend (e.g. a LocalStorageBackend in tests)."""
+    global _default_backend
+    _default_backend = backend
@@ -0,0 +1,18 @@
+import pandas as pd
+
+from date_parsing import parse_datetime_column
+
+
+def test_excel_serials_and_strings():
+    parsed = parse_datetime_column(pd.Series(["45234", "05/03/2024", None]))
+    assert list(parsed[:2]) == [pd.Timestamp("2023-11-04"), pd.Timestamp("2024-03-05")]
+    assert pd.isna(parsed[2])
+
+
+def test_year_only_cells_are_not_excel_serials():
+    parsed = parse_datetime_column(pd.Series(["2024", 2023, "45234"], dtype=object))
+    assert list(parsed) == [
+        pd.Timestamp("2024-01-01"),
+        pd.Timestamp("2023-01-01"),
+        pd.Timestamp("2023-11-04"),
+    ]
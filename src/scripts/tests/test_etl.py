@@ -0,0 +1,119 @@
+import math
+
+import pandas as pd
+import pytest
+
+import etl
+import etl_worker
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("1.250.000", 1_250_000.0),
+        ("1.250.000,5", 1_250_000.5),
+        ("2,000,000.5", 2_000_000.5),
+        ("2,000,000", 2_000_000.0),
+        ("Rp 1.250", 1_250.0),
+        ("1,5", 1.5),
+        ("12.75", 12.75),
+        ("-3.000", -3_000.0),
+        (2.125, 2.125),
+        ("1.25.3", None),
+        ("", None),
+    ],
+)
+def test_parse_money(raw, expected):
+    value = etl.parse_money(raw)
+    if expected is None:
+        assert math.isnan(value)
+    else:
+        assert value == expected
+
+
+def test_clean_and_normalize_revenue_and_stage():
+    df_raw = pd.DataFrame(
+        {
+            "Company": ["PT A", "PT B", "PT C"],
+            "Project": ["P1", "P2", "P3"],
+            "Status": ["Won", "open", None],
+            "Est Revenue": ["1.250.000", "1.250.000,5", "2,000,000.5"],
+        }
+    )
+
+    df = etl_worker.clean_and_normalize(df_raw, "SALES")
+
+    assert list(df["funnel_stage"]) == ["win", "leads", "leads"]
+    assert list(df["est_revenue"]) == [1_250_000.0, 1_250_000.5, 2_000_000.5]
+
+
+def test_parse_hps_to_m():
+    values = pd.Series(
+        [
+            "Rp 150.000",
+            "IDR 2500000",
+            "1.500.000.000",
+            "150,000,000",
+            "IDR 1,250,000,000",
+            "Rp 150.000.000,-",
+            "Rp 150.000.000,00",
+            "1,5 M",
+            "750 Jt",
+            "150",
+            "500000",
+            "2500000000",
+            None,
+        ],
+        dtype=object,
+    )
+    parsed = etl_worker.parse_hps_to_m(values)
+    assert list(parsed[:12]) == pytest.approx(
+        [0.00015, 0.0025, 1.5, 0.15, 1.25, 0.15, 0.15, 1.5, 0.75, 150.0, 0.0005, 2.5]
+    )
+    assert pd.isna(parsed[12])
+
+
+def test_parse_hps_to_m_numeric_column():
+    parsed = etl_worker.parse_hps_to_m(pd.Series([2.5, 750_000_000, 500_000]))
+    assert list(parsed) == pytest.approx([2.5, 0.75, 0.0005])
+
+
+def test_parse_money_series_matches_parse_money():
+    cases = ["1.250.000", "1.250.000,5", "2,000,000.5", "Rp 1.250", "1,5", "12.75", "-3.000", "1.25.3", "", None]
+    vectorized = etl.parse_money_series(pd.Series(cases, dtype=object))
+    expected = pd.Series([etl.parse_money(c) for c in cases], dtype="float64")
+    pd.testing.assert_series_equal(vectorized, expected)
+
+
+def _write_lop_workbook(path, rows):
+    # Two title rows above the header, like the LOP template (header row 3)
+    header = ["Customer", "Project", "Stage", "Nilai 2026", "Tanggal"]
+    pd.DataFrame([["LOP 2026"] + [None] * 4, [None] * 5, header] + rows).to_excel(
+        path, index=False, header=False
+    )
+
+
+def test_run_pipeline_keeps_numeric_money_cells(tmp_path):
+    path = tmp_path / "lop.xlsx"
+    _write_lop_workbook(
+        path,
+        [
+            ["PT A", "Proyek A", "won", 2.375, "05/03/2024"],
+            ["PT B", "Proyek B", "lead", "1.250.000", "06/03/2024"],
+        ],
+    )
+
+    result = etl.run_pipeline(etl.EtlConfig(excel_path=str(path)), write=False)
+
+    revenue = result.df.set_index("company_name")["est_revenue"]
+    assert revenue["PT A"] == 2.375
+    assert revenue["PT B"] == 1_250_000.0
+    assert list(result.df["funnel_stage"]) == ["win", "leads"]
+
+
+def test_run_frame_float_money_cell():
+    df = pd.DataFrame(
+        {"Customer": ["PT A"], "Project": ["Proyek A"], "est win (mm)": [2.375], "Tanggal": ["05/03/2024"]}
+    )
+    result = etl.run_frame(df)
+    assert result.df["est_revenue"].iloc[0] == 2.375
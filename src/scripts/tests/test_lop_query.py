@@ -0,0 +1,97 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+from lop_query import LopQueryEngine
+
+
+COLUMNS = ("segment", "funnel_stage", "source_division", "est_revenue", "created_at")
+
+
+def _write_snapshot(output_dir, stamp, rows, columns=COLUMNS):
+    df = pd.DataFrame(rows, columns=list(columns))
+    if "created_at" in df.columns:
+        df["created_at"] = pd.to_datetime(df["created_at"])
+    path = output_dir / f"lop_clean_{stamp}.parquet"
+    df.to_parquet(path, index=False)
+    return path
+
+
+ROWS = [
+    ("GOV", "leads", "SALES", 1_000_000, "2024-01-15"),
+    ("GOV", "leads", "BIDDING", 2_000_000, "2024-03-01"),
+    ("GOV", "win", "SALES", 5_000_000, "2025-02-01"),
+    ("ENT", "prospect", "MSDC", 3_000_000, "2024-02-10"),
+    ("ENT", "open", "SALES", 9_000_000, "2024-02-11"),
+    ("ENT", None, "SALES", 7_000_000, "2024-02-12"),
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    _write_snapshot(tmp_path, "20260101-000000", ROWS)
+    with LopQueryEngine(tmp_path) as eng:
+        yield eng
+
+
+def test_funnel_per_segment_grain_and_totals(engine):
+    df = engine.funnel_per_segment()
+
+    assert list(df.columns) == ["segment", "stage", "project_count", "total_m"]
+    assert list(zip(df["segment"], df["stage"])) == [
+        ("ENT", "prospect"),
+        ("GOV", "leads"),
+        ("GOV", "win"),
+    ]
+    assert list(df["project_count"]) == [1, 2, 1]
+    assert list(df["total_m"]) == pytest.approx([3.0, 3.0, 5.0])
+
+
+def test_segment_summary_totals_match_stage_columns(engine):
+    df = engine.segment_summary().set_index("segment")
+
+    stage_counts = df[[c for c in df.columns if c.endswith("_projects")]].sum(axis=1)
+    stage_totals = df[[c for c in df.columns if c.endswith("_m") and c != "total_m"]].sum(axis=1)
+    assert (df["project_count"] == stage_counts).all()
+    assert df["total_m"].tolist() == pytest.approx(stage_totals.tolist())
+    assert df.loc["ENT", "project_count"] == 1
+
+
+def test_source_division_breakdown_excludes_out_of_funnel_stages(engine):
+    df = engine.source_division_breakdown()
+    assert set(df["stage"]) <= {"leads", "prospect", "win"}
+    assert df["project_count"].sum() == 4
+
+
+def test_period_filter(engine):
+    df = engine.funnel_per_segment(year=2024, month_from=2, month_to=3)
+    assert list(zip(df["segment"], df["stage"], df["project_count"])) == [
+        ("ENT", "prospect", 1),
+        ("GOV", "leads", 1),
+    ]
+
+
+def test_period_filter_without_created_at(tmp_path):
+    rows = [row[:4] for row in ROWS]
+    _write_snapshot(tmp_path, "20260101-000000", rows, columns=COLUMNS[:4])
+
+    with LopQueryEngine(tmp_path) as eng:
+        assert eng.funnel_per_segment(year=2024).empty
+        assert eng.funnel_per_segment()["project_count"].sum() == 4
+
+
+def test_cache_invalidated_by_newer_snapshot(tmp_path):
+    _write_snapshot(tmp_path, "20260101-000000", ROWS)
+    with LopQueryEngine(tmp_path) as eng:
+        first = eng.funnel_per_segment()
+        first_version = eng.version
+        assert eng.funnel_per_segment().equals(first)
+        assert len(eng._cache) == 1
+
+        _write_snapshot(tmp_path, "20260102-000000", [("GOV", "win", "SALES", 4_000_000, "2026-01-02")])
+        second = eng.funnel_per_segment()
+
+        assert eng.version != first_version
+        assert list(zip(second["segment"], second["stage"], second["project_count"])) == [("GOV", "win", 1)]
+        assert all(key[0] == eng.version for key in eng._cache)
@@ -0,0 +1,176 @@
+"""merge_staged_imports ordering: source priority, then newest import, then last row.
+
+The SQL-shape tests run everywhere with a fake cursor. The end-to-end
+tests need a scratch Postgres: set ETL_TEST_DATABASE_URL (they create and
+drop their own schema).
+"""
+
+import os
+import uuid
+
+import pytest
+
+import etl_worker
+
+
+class FakeCursor:
+    def __init__(self, rows=()):
+        self.executed = []
+        self.rows = list(rows)
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_merge_params_and_order_by():
+    cur = FakeCursor()
+    etl_worker.merge_staged_imports(cur, "tenant", ["old", "new"])
+
+    _, companies_params = cur.executed[0]
+    opportunities_sql, params = cur.executed[1]
+    assert companies_params == params
+    assert params["import_ids"] == ["old", "new"]
+    assert params["priority"] == etl_worker.SOURCE_PRIORITY
+    assert params["fallback_rank"] == len(etl_worker.SOURCE_PRIORITY) + 1
+
+    order_by = opportunities_sql[opportunities_sql.index("ORDER BY"):]
+    priority = order_by.index("array_position(%(priority)s::text[], sc.source_division)")
+    newest_import = order_by.index("array_position(%(import_ids)s::uuid[], sc.import_id) DESC")
+    last_row = order_by.index("sc.row_number DESC")
+    assert priority < newest_import < last_row
+    assert "<= COALESCE(array_position(%(priority)s::text[], opportunities.source_division)" in opportunities_sql
+
+
+def test_merge_returns_written_rows_per_import():
+    cur = FakeCursor(rows=[("new", 3, 1)])
+    assert etl_worker.merge_staged_imports(cur, "tenant", ["old", "new"]) == {"old": 0, "new": 3}
+
+
+# ---------------------------------------------------------------------------
+# Postgres
+# ---------------------------------------------------------------------------
+
+SCHEMA_SQL = """
+create table companies (
+  id uuid primary key default gen_random_uuid(),
+  tenant_id uuid not null,
+  name text,
+  name_canonical text not null,
+  segment text,
+  updated_at timestamptz,
+  unique (tenant_id, name_canonical)
+);
+create table opportunities (
+  id uuid primary key default gen_random_uuid(),
+  tenant_id uuid not null,
+  company_id uuid not null references companies (id),
+  project_name text,
+  project_name_canonical text not null,
+  stage text,
+  amount numeric,
+  source_division text,
+  created_at timestamptz,
+  updated_at timestamptz,
+  unique (tenant_id, company_id, project_name_canonical)
+);
+create table stg_clean_rows (
+  import_id uuid not null,
+  row_number integer not null,
+  company_name text,
+  company_name_canonical text,
+  project_name text,
+  project_name_canonical text,
+  sales_person text,
+  source_division text,
+  funnel_stage text,
+  est_revenue numeric,
+  segment text,
+  created_at timestamptz,
+  import_date date not null default current_date
+);
+"""
+
+
+@pytest.fixture
+def pg_cursor():
+    dsn = os.environ.get("ETL_TEST_DATABASE_URL")
+    if not dsn:
+        pytest.skip("set ETL_TEST_DATABASE_URL to run the Postgres merge tests")
+    import psycopg2
+
+    schema = f"etl_merge_test_{uuid.uuid4().hex[:8]}"
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute(f"create schema {schema}; set search_path to {schema}")
+    cur.execute(SCHEMA_SQL)
+    try:
+        yield cur
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def _stage(cur, import_id, division, rows):
+    """rows: (row_number, project, stage)"""
+    for row_number, project, stage in rows:
+        cur.execute(
+            """
+            insert into stg_clean_rows (
+              import_id, row_number, company_name, company_name_canonical,
+              project_name, project_name_canonical, source_division, funnel_stage
+            ) values (%s, %s, 'PT A', 'PT A', %s, %s, %s, %s)
+            """,
+            (import_id, row_number, project, project, division, stage),
+        )
+
+
+def _opportunities(cur, tenant_id):
+    cur.execute(
+        "select project_name_canonical, stage, source_division from opportunities "
+        "where tenant_id = %s order by 1",
+        (tenant_id,),
+    )
+    return cur.fetchall()
+
+
+def _imports():
+    """(import_id, division, rows), oldest first."""
+    older, newer = str(uuid.uuid4()), str(uuid.uuid4())
+    return [
+        (older, "BIDDING", [(1, "P1", "prospect")]),
+        (older, "SALES", [(2, "P3", "leads")]),
+        (newer, "SALES", [(1, "P1", "win"), (2, "P2", "leads"), (3, "P2", "qualified"), (4, "P3", "submission")]),
+    ], [older, newer]
+
+
+EXPECTED = [("P1", "prospect", "BIDDING"), ("P2", "qualified", "SALES"), ("P3", "submission", "SALES")]
+
+
+def test_merge_batch_priority_then_newest_import_then_last_row(pg_cursor):
+    tenant_id = str(uuid.uuid4())
+    staged, import_ids = _imports()
+    for import_id, division, rows in staged:
+        _stage(pg_cursor, import_id, division, rows)
+
+    written = etl_worker.merge_staged_imports(pg_cursor, tenant_id, import_ids)
+
+    assert _opportunities(pg_cursor, tenant_id) == EXPECTED
+    assert written == {import_ids[0]: 1, import_ids[1]: 2}
+
+
+def test_merge_one_at_a_time_matches_batch(pg_cursor):
+    tenant_id = str(uuid.uuid4())
+    staged, import_ids = _imports()
+    written = {}
+    for import_id in import_ids:
+        for staged_id, division, rows in staged:
+            if staged_id == import_id:
+                _stage(pg_cursor, import_id, division, rows)
+        written.update(etl_worker.merge_staged_imports(pg_cursor, tenant_id, [import_id]))
+
+    assert _opportunities(pg_cursor, tenant_id) == EXPECTED
+    # The newer SALES row for P1 is kept out by the stored BIDDING row
+    assert written == {import_ids[0]: 2, import_ids[1]: 2}
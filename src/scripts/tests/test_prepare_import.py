@@ -0,0 +1,82 @@
+"""Offline `prepare_import` runs against a LocalStorageBackend temp directory."""
+
+import pandas as pd
+import pytest
+
+import etl_worker
+import storage_client
+from storage_client import LocalStorageBackend
+
+
+class RecordingBackend(LocalStorageBackend):
+    """LocalStorageBackend that keeps the objects it hands out."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.downloads = []
+
+    def download(self, storage_path, bucket, expected_sha256=None):
+        obj = super().download(storage_path, bucket, expected_sha256)
+        self.downloads.append(obj)
+        return obj
+
+
+@pytest.fixture
+def storage_root(tmp_path):
+    (tmp_path / etl_worker.BUCKET_NAME / "tenant").mkdir(parents=True)
+    yield tmp_path
+    storage_client.set_storage_backend(None)
+
+
+def _use_backend(root, **kwargs):
+    backend = RecordingBackend(root, **kwargs)
+    storage_client.set_storage_backend(backend)
+    return backend
+
+
+def test_prepare_import_csv(storage_root):
+    (storage_root / "imports/tenant/lop.csv").write_text(
+        "Company,Project,Est Revenue,Tanggal\n"
+        "pt  maju,Proyek A,1250000,05/03/2024\n"
+        "PT Maju,Proyek B,2000000,06/03/2024\n"
+    )
+    backend = _use_backend(storage_root)
+
+    df_raw, df_clean = etl_worker.prepare_import("tenant/lop.csv", "SALES")
+
+    assert len(df_raw) == 2
+    assert list(df_clean["company_name_canonical"]) == ["PT MAJU", "PT MAJU"]
+    assert list(df_clean["est_revenue"]) == [1_250_000.0, 2_000_000.0]
+    assert list(df_clean["created_at"]) == [pd.Timestamp("2024-03-05"), pd.Timestamp("2024-03-06")]
+    assert not backend.downloads[0].file._rolled
+    assert backend.downloads[0].file.closed
+
+
+def test_prepare_import_xlsx_leads(storage_root):
+    pd.DataFrame(
+        {
+            "Customer": ["Dinas PU", None],
+            "Nama Tender": ["Jalan Tol", None],
+            "Nilai HPS": ["Rp 1.500.000.000", "Rp 2.000.000.000"],
+        }
+    ).to_excel(storage_root / "imports/tenant/leads.xlsx", index=False)
+    _use_backend(storage_root)
+
+    df_raw, df_clean = etl_worker.prepare_import("tenant/leads.xlsx", etl_worker.LEADS_DIVISION)
+
+    assert len(df_raw) == 2
+    assert len(df_clean) == 1
+    assert df_clean["customer_name"].iloc[0] == "Dinas PU"
+    assert df_clean["project_value_m"].iloc[0] == pytest.approx(1.5)
+
+
+def test_prepare_import_spools_large_files_to_disk(storage_root):
+    rows = "".join(f"PT {i},Proyek {i},{i * 1000}\n" for i in range(2000))
+    (storage_root / "imports/tenant/big.csv").write_text("Company,Project,Est Revenue\n" + rows)
+    backend = _use_backend(storage_root, spool_max_bytes=1024)
+
+    df_raw, df_clean = etl_worker.prepare_import("tenant/big.csv", "BIDDING")
+
+    assert len(df_raw) == len(df_clean) == 2000
+    assert backend.downloads[0].file._rolled
+    assert df_clean["est_revenue"].iloc[-1] == 1_999_000.0
@@ -0,0 +1,62 @@
+"""SupabaseStorageBackend retry behaviour with a fake HTTP session."""
+
+import hashlib
+
+import pytest
+
+from storage_client import StorageError, SupabaseStorageBackend
+
+
+class FakeResponse:
+    def __init__(self, body, headers):
+        self.status_code = 200
+        self.reason = "OK"
+        self.text = ""
+        self.body = body
+        self.headers = headers
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def _backend(responses, max_retries=2):
+    backend = SupabaseStorageBackend("http://storage.test", "key", max_retries=max_retries, backoff=0)
+    backend.session = FakeSession(responses)
+    return backend
+
+
+BODY = b"Company,Project\nPT A,Proyek A\n"
+GOOD_HEADERS = {"Content-Length": str(len(BODY)), "ETag": f'"{hashlib.md5(BODY).hexdigest()}"'}
+
+
+def test_download_retries_truncated_body():
+    backend = _backend([FakeResponse(BODY[:10], GOOD_HEADERS), FakeResponse(BODY, GOOD_HEADERS)])
+
+    with backend.download("tenant/lop.csv", "imports") as obj:
+        assert obj.read_bytes() == BODY
+    assert backend.session.calls == 2
+
+
+def test_download_gives_up_after_max_retries_on_integrity_errors():
+    bad_etag = {"Content-Length": str(len(BODY)), "ETag": '"' + "0" * 32 + '"'}
+    backend = _backend([FakeResponse(BODY, bad_etag) for _ in range(3)], max_retries=2)
+
+    with pytest.raises(StorageError, match="after 3 attempts"):
+        backend.download("tenant/lop.csv", "imports")
+    assert backend.session.calls == 3
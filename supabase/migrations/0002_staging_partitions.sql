@@ -0,0 +1,165 @@
+-- Staging table lifecycle for the ETL worker.
+--
+-- stg_raw_rows / stg_clean_rows are only read while an import is being
+-- merged, but nothing ever deleted them. They are now range-partitioned by
+-- import_date (one partition per day), indexed for the upsert join, and
+-- pruned by dropping whole partitions instead of running DELETE.
+--
+-- import_date defaults to current_date; the worker stages and merges in one
+-- transaction, so the merge can filter on import_date = current_date and
+-- only touch today's partition.
+
+-- 1) Move the unpartitioned tables aside
+alter table if exists stg_raw_rows rename to stg_raw_rows_legacy;
+alter table if exists stg_clean_rows rename to stg_clean_rows_legacy;
+
+-- 2) Partitioned replacements
+create table if not exists stg_raw_rows (
+  id bigint generated by default as identity,
+  import_id uuid not null,
+  row_number integer not null,
+  raw_json jsonb,
+  import_date date not null default current_date,
+  created_at timestamptz default now(),
+  constraint stg_raw_rows_pk primary key (import_date, id)
+) partition by range (import_date);
+
+create table if not exists stg_clean_rows (
+  id bigint generated by default as identity,
+  import_id uuid not null,
+  row_number integer not null,
+  company_name text,
+  company_name_canonical text,
+  project_name text,
+  project_name_canonical text,
+  sales_person text,
+  source_division text,
+  funnel_stage text,
+  est_revenue numeric,
+  segment text,
+  created_at timestamptz,
+  import_date date not null default current_date,
+  constraint stg_clean_rows_pk primary key (import_date, id)
+) partition by range (import_date);
+
+-- Indexes on the parent cascade to every partition.
+create index if not exists stg_raw_rows_import_idx
+  on stg_raw_rows (import_id, row_number);
+create index if not exists stg_clean_rows_import_company_idx
+  on stg_clean_rows (import_id, company_name_canonical, project_name_canonical);
+
+-- 3) Partition management
+-- Creates the daily partitions for p_day. Staging rows are rebuildable from
+-- the uploaded file, so callers may ask for UNLOGGED partitions (no WAL,
+-- truncated after a crash).
+--
+-- CREATE TABLE ... PARTITION OF locks the parent until commit, so the worker
+-- calls this ahead of time (today + a few days) in its own short
+-- transaction, never inside a load. Two workers racing on the same day
+-- both pass the to_regclass check; the loser's duplicate is ignored.
+create or replace function ensure_stg_partitions(
+  p_day date default current_date,
+  p_unlogged boolean default false
+) returns void
+language plpgsql
+as $$
+declare
+  parent text;
+  part text;
+begin
+  foreach parent in array array['stg_raw_rows', 'stg_clean_rows'] loop
+    part := format('%s_p%s', parent, to_char(p_day, 'YYYYMMDD'));
+    if to_regclass(part) is null then
+      begin
+        execute format(
+          'create %s table if not exists %I partition of %I for values from (%L) to (%L)',
+          case when p_unlogged then 'unlogged' else '' end,
+          part, parent, p_day, p_day + 1
+        );
+      exception
+        when duplicate_table or unique_violation then
+          null;  -- created concurrently by another worker
+      end;
+    end if;
+  end loop;
+end;
+$$;
+
+-- Drops staging partitions whose day is older than p_days; returns their names.
+create or replace function drop_stg_partitions_older_than(p_days integer)
+returns setof text
+language plpgsql
+as $$
+declare
+  r record;
+begin
+  for r in
+    select child.relname
+    from pg_inherits i
+    join pg_class child on child.oid = i.inhrelid
+    join pg_class parent on parent.oid = i.inhparent
+    where parent.relname in ('stg_raw_rows', 'stg_clean_rows')
+      and child.relname ~ '_p[0-9]{8}$'
+      and to_date(right(child.relname, 8), 'YYYYMMDD') < current_date - p_days
+    order by child.relname
+  loop
+    execute format('drop table if exists %I', r.relname);
+    return next r.relname;
+  end loop;
+end;
+$$;
+
+-- 4) Carry over the last 14 days of staging rows (dated by their import),
+--    then drop the legacy tables.
+do $$
+declare
+  d date;
+begin
+  if to_regclass('stg_clean_rows_legacy') is not null then
+    for d in
+      select distinct i.created_at::date
+      from imports i
+      where i.created_at >= current_date - 14
+        and exists (select 1 from stg_clean_rows_legacy l where l.import_id = i.id)
+    loop
+      perform ensure_stg_partitions(d);
+    end loop;
+
+    insert into stg_clean_rows (
+      import_id, row_number, company_name, company_name_canonical, project_name,
+      project_name_canonical, sales_person, source_division, funnel_stage,
+      est_revenue, segment, created_at, import_date
+    )
+    select
+      l.import_id, l.row_number, l.company_name, l.company_name_canonical, l.project_name,
+      l.project_name_canonical, l.sales_person, l.source_division, l.funnel_stage,
+      l.est_revenue, l.segment, l.created_at, i.created_at::date
+    from stg_clean_rows_legacy l
+    join imports i on i.id = l.import_id
+    where i.created_at >= current_date - 14;
+
+    drop table stg_clean_rows_legacy;
+  end if;
+
+  if to_regclass('stg_raw_rows_legacy') is not null then
+    for d in
+      select distinct i.created_at::date
+      from imports i
+      where i.created_at >= current_date - 14
+        and exists (select 1 from stg_raw_rows_legacy l where l.import_id = i.id)
+    loop
+      perform ensure_stg_partitions(d);
+    end loop;
+
+    insert into stg_raw_rows (import_id, row_number, raw_json, import_date)
+    select l.import_id, l.row_number, l.raw_json, i.created_at::date
+    from stg_raw_rows_legacy l
+    join imports i on i.id = l.import_id
+    where i.created_at >= current_date - 14;
+
+    drop table stg_raw_rows_legacy;
+  end if;
+end;
+$$;
+
+select ensure_stg_partitions(current_date + d) from generate_series(0, 3) as d;
@@ -0,0 +1,43 @@
+-- MSDC leads: bulk-load support and indexed search.
+--
+-- /api/leads/msdc searches customer_name, tender_name and pic with substring
+-- matching and filters by status_tender and year. `search_text` holds the
+-- lower-cased, whitespace-collapsed concatenation of those three columns and
+-- is kept up to date by a trigger, so rows written by the ETL worker, the
+-- app or by hand all stay searchable. `q` becomes a single ILIKE on one
+-- column served by a trigram index instead of an OR across three unindexed
+-- columns.
+
+create extension if not exists pg_trgm;
+
+alter table leads add column if not exists search_text text;
+alter table leads add column if not exists import_id uuid;
+
+create or replace function leads_set_search_text()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.search_text := nullif(lower(regexp_replace(
+    trim(concat_ws(' ', new.customer_name, new.tender_name, new.pic)), '\s+', ' ', 'g'
+  )), '');
+  return new;
+end;
+$$;
+
+drop trigger if exists leads_search_text_trg on leads;
+create trigger leads_search_text_trg
+  before insert or update of customer_name, tender_name, pic, search_text on leads
+  for each row execute function leads_set_search_text();
+
+-- Backfill rows loaded before this migration through the trigger.
+update leads set search_text = null where search_text is null;
+
+create index if not exists leads_search_text_trgm_idx
+  on leads using gin (search_text gin_trgm_ops);
+
+create index if not exists leads_tenant_status_created_idx
+  on leads (tenant_id, status_tender, created_at desc);
+
+-- Lets the worker replace the rows of a re-run import.
+create index if not exists leads_import_idx on leads (import_id);